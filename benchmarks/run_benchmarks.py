@@ -0,0 +1,241 @@
+"""仿真/适应度评估/优化热点路径的基准测试
+
+用法:
+    python -m benchmarks.run_benchmarks -o bench.json
+    python -m benchmarks.run_benchmarks --sizes 32 64 --compare bench.json
+
+使用合成掩膜在不同图像尺寸与种群规模下测量：
+  simulate        LithographySimulator.simulate单次调用延迟
+  simulate_batch  整个种群一次批量仿真的延迟与吞吐
+  evaluate        MaskOptimizer.evaluate_individual单个体延迟
+  evaluate_population  整代批量评估的每秒评估次数
+  optimize        完整optimize运行的总耗时
+并用tracemalloc记录各项的峰值内存。结果以JSON保存，--compare与以往结果逐项
+对比，变慢超过阈值时返回非零退出码，便于在提交之间检查性能回退。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.genetic_algorithm import MaskOptimizer
+from core.lithography_simulation import LithographySimulator, OpticalKernelCache
+from gradio_app.config.lithography_config import DEFAULT_PARAMETERS, SIMULATION_OPTIONS
+
+DEFAULT_SIZES = (32, 64, 128, 256, 512)
+DEFAULT_POPULATIONS = (20, 50)
+# 比较时耗时增加超过该比例视为性能回退
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+
+def synthetic_mask(size, seed=0):
+    """随机矩形组成的二值合成掩膜"""
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((size, size), dtype=np.float32)
+    for _ in range(max(4, size // 8)):
+        top, left = rng.integers(0, size, size=2)
+        height, width = rng.integers(2, max(3, size // 4), size=2)
+        mask[top:top + height, left:left + width] = 1.0
+    return mask
+
+
+def measure(func, repeats, min_time=0.2):
+    """多次调用func，返回每次调用耗时（秒）的列表；总时间不足min_time时继续重复"""
+    func()  # 预热：构建光学核、FFT计划等
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < repeats or time.perf_counter() - start < min_time:
+        begin = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - begin)
+        if len(timings) >= 100 * repeats:
+            break
+    return timings
+
+
+def peak_memory(func):
+    """单次调用期间通过tracemalloc观测到的峰值内存（字节）"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(name, params, timings, memory, work=1):
+    """汇总一项基准：work为每次调用完成的评估次数，用于计算吞吐"""
+    timings = np.asarray(timings)
+    median = float(np.median(timings))
+    return {
+        "name": name,
+        "params": params,
+        "repeats": len(timings),
+        "median_s": median,
+        "min_s": float(np.min(timings)),
+        "p95_s": float(np.percentile(timings, 95)),
+        "evals_per_s": work / median if median > 0 else None,
+        "peak_memory_bytes": int(memory),
+    }
+
+
+def benchmark_parameters(size, population, **extra):
+    return {**DEFAULT_PARAMETERS, **SIMULATION_OPTIONS, "image_size": size,
+            "population_size": population, "fitness_cache_size": 0, "incremental_fitness": False,
+            "seed": 0, **extra}
+
+
+def run_size(size, populations, generations, repeats):
+    results = []
+    parameters = benchmark_parameters(size, populations[0])
+    # 每个尺寸使用独立的核缓存，避免大尺寸的核被其他尺寸挤出
+    simulator = LithographySimulator(parameters, OpticalKernelCache())
+    mask = synthetic_mask(size)
+    target = synthetic_mask(size, seed=1)
+
+    call = lambda: simulator.simulate(mask)
+    results.append(summarize("simulate", {"size": size}, measure(call, repeats), peak_memory(call)))
+
+    optimizer = MaskOptimizer(simulator, target)
+    individual = optimizer.create_individual_with_noise(mask.ravel())
+    call = lambda: optimizer.evaluate_individual(individual)
+    results.append(summarize("evaluate", {"size": size}, measure(call, repeats), peak_memory(call)))
+
+    for population in populations:
+        rng = np.random.default_rng(population)
+        masks = (rng.random((population, size, size)) < 0.5).astype(np.float32)
+        call = lambda: simulator.simulate_batch(masks)
+        results.append(summarize("simulate_batch", {"size": size, "population": population},
+                                 measure(call, repeats), peak_memory(call), work=population))
+
+        individuals = [optimizer.create_individual_with_noise(m.ravel()) for m in masks]
+        call = lambda: optimizer.evaluate_population(individuals)
+        results.append(summarize("evaluate_population", {"size": size, "population": population},
+                                 measure(call, repeats), peak_memory(call), work=population))
+
+        run_parameters = benchmark_parameters(size, population, generations=generations)
+        run_simulator = LithographySimulator(run_parameters, simulator.kernel_cache)
+
+        def call():
+            # 屏蔽每代打印的日志
+            with contextlib.redirect_stdout(io.StringIO()):
+                MaskOptimizer(run_simulator, target).optimize(mask)
+
+        timings = measure(call, max(1, repeats // 3), min_time=0)
+        results.append(summarize("optimize", {"size": size, "population": population,
+                                              "generations": generations},
+                                 timings, peak_memory(call), work=population * (generations + 1)))
+    return results
+
+
+def scaling_exponents(results):
+    """各基准耗时随图像边长变化的对数斜率（理想的FFT约为2，即与像素数近似成正比）"""
+    curves = {}
+    for result in results:
+        params = dict(result["params"])
+        size = params.pop("size")
+        key = result["name"] + "".join(f" {k}={v}" for k, v in sorted(params.items()))
+        curves.setdefault(key, []).append((size, result["median_s"]))
+
+    exponents = {}
+    for key, points in curves.items():
+        if len(points) >= 2:
+            sizes, times = np.log(np.array(sorted(points))).T
+            exponents[key] = float(np.polyfit(sizes, times, 1)[0])
+    return exponents
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def result_key(result):
+    return result["name"], tuple(sorted(result["params"].items()))
+
+
+def compare(results, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """与基线结果逐项比较中位耗时，返回变慢超过threshold的项目列表"""
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    print(f"\n与基线 {baseline['environment'].get('commit')} 比较（中位耗时，比值>1为变慢）:")
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        ratio = result["median_s"] / old["median_s"] if old["median_s"] > 0 else float("inf")
+        flag = "  <-- 回退" if ratio > 1 + threshold else ""
+        print(f"  {describe(result):<48} {old['median_s'] * 1e3:10.3f}ms -> "
+              f"{result['median_s'] * 1e3:10.3f}ms  x{ratio:.2f}{flag}")
+        if flag:
+            regressions.append(describe(result))
+    return regressions
+
+
+def describe(result):
+    return result["name"] + "".join(f" {k}={v}" for k, v in result["params"].items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="光刻仿真与优化热点路径基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="图像边长")
+    parser.add_argument("--populations", type=int, nargs="+", default=list(DEFAULT_POPULATIONS), help="种群规模")
+    parser.add_argument("--generations", type=int, default=3, help="optimize基准的迭代次数")
+    parser.add_argument("--repeats", type=int, default=5, help="每项最少重复次数")
+    parser.add_argument("-o", "--output", default=None, help="结果JSON文件")
+    parser.add_argument("--compare", default=None, help="与之比较的以往结果JSON文件")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="判定为性能回退的耗时增加比例")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        print(f"图像尺寸 {size}x{size} ...")
+        for result in run_size(size, args.populations, args.generations, args.repeats):
+            results.append(result)
+            throughput = f"{result['evals_per_s']:10.1f} 次/秒" if result["evals_per_s"] else ""
+            print(f"  {describe(result):<48} {result['median_s'] * 1e3:10.3f}ms  {throughput}  "
+                  f"峰值内存 {result['peak_memory_bytes'] / 2 ** 20:8.2f}MB")
+
+    exponents = scaling_exponents(results)
+    if exponents:
+        print("\n耗时随图像边长的缩放指数:")
+        for key, exponent in exponents.items():
+            print(f"  {key:<48} {exponent:6.2f}")
+
+    report = {"environment": environment(), "results": results, "scaling_exponents": exponents}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 项性能回退超过 {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""批量掩膜优化命令行工具
+
+用法:
+    python -m core.batch manifest.yaml -o results/ --workers 4
+
+清单文件为YAML/JSON或CSV。YAML/JSON格式:
+    parameters:            # 可选，覆盖默认参数，对所有任务生效
+      generations: 50
+    jobs:
+      - name: via_01       # 可选，默认取掩膜文件名
+        mask: masks/via_01.png
+        target: targets/via_01.png
+        parameters: {}     # 可选，仅对该任务生效
+CSV格式需包含mask、target两列，name列可选。相对路径以清单文件所在目录为基准。
+
+每个任务在输出目录下生成<name>/result.npz、mask.png、binary.png、log.csv，
+所有任务的PE与停止原因汇总到summary.csv。
+"""
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import yaml
+from PIL import Image
+
+from .optimizers import job_processes
+from .pipeline import run_job
+from gradio_app.config.lithography_config import DEFAULT_PARAMETERS, SIMULATION_OPTIONS
+
+
+def load_manifest(path):
+    """读取清单文件，返回(公共参数, 任务列表)，任务中的路径已解析为绝对路径"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith(".csv"):
+        common, jobs = {}, pd.read_csv(path).to_dict("records")
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = yaml.safe_load(f) or {}
+        common, jobs = manifest.get("parameters") or {}, manifest.get("jobs") or []
+
+    resolved = []
+    for index, job in enumerate(jobs):
+        if "mask" not in job or "target" not in job:
+            raise ValueError(f"清单第 {index + 1} 个任务缺少mask或target")
+        mask = os.path.join(base_dir, job["mask"])
+        name = job.get("name")
+        if not isinstance(name, str) or not name:
+            name = f"{index:04d}_{os.path.splitext(os.path.basename(mask))[0]}"
+        resolved.append({"name": name, "mask": mask,
+                         "target": os.path.join(base_dir, job["target"]),
+                         "parameters": job.get("parameters") or {}})
+
+    names = [job["name"] for job in resolved]
+    if len(set(names)) != len(names):
+        raise ValueError("清单中的任务名称重复")
+    return common, resolved
+
+
+def save_image(array, path):
+    image = np.clip(np.nan_to_num(array), 0, 1)
+    Image.fromarray((image * 255).astype(np.uint8)).save(path)
+
+
+def save_results(results, job_dir):
+    """将一个任务的结果写入job_dir"""
+    os.makedirs(job_dir, exist_ok=True)
+    initial, optimized = results["initial"], results["optimized"]
+    np.savez_compressed(
+        os.path.join(job_dir, "result.npz"),
+        target=results["target"],
+        initial_mask=initial["mask"],
+        initial_simulation=initial["simulation"],
+        initial_binary=initial["binary"],
+        optimized_mask=optimized["mask"],
+        optimized_simulation=optimized["simulation"],
+        optimized_binary=optimized["binary"],
+    )
+    save_image(optimized["mask"], os.path.join(job_dir, "mask.png"))
+    save_image(optimized["binary"], os.path.join(job_dir, "binary.png"))
+    pd.DataFrame(list(results["log"])).to_csv(os.path.join(job_dir, "log.csv"), index=False)
+
+
+def execute_job(job, parameters, output_dir):
+    """在工作进程中执行单个任务并保存结果，返回汇总行"""
+    start_time = time.perf_counter()
+    row = {"name": job["name"], "mask": job["mask"], "target": job["target"]}
+    try:
+        results = run_job(job["mask"], job["target"], parameters)
+        save_results(results, os.path.join(output_dir, job["name"]))
+        row.update(status="ok", initial_pe=float(results["initial"]["pe"]),
+                   optimized_pe=float(results["optimized"]["pe"]),
+                   generations=len(results["log"]) - 1,
+                   stop_reason=getattr(results["log"], "stop_reason", None), error="")
+    except Exception as e:
+        traceback.print_exc()
+        row.update(status="failed", error=str(e))
+    row["duration"] = time.perf_counter() - start_time
+    return row
+
+
+def run_batch(manifest_path, output_dir, workers=None, overrides=None):
+    """执行清单中的全部任务，返回汇总表（DataFrame）"""
+    common, jobs = load_manifest(manifest_path)
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+
+    def job_parameters(job):
+        parameters = {**DEFAULT_PARAMETERS, **SIMULATION_OPTIONS, **common,
+                      **job["parameters"], **(overrides or {})}
+        # 任务之间已经并行，任务内部不再开进程池或多线程FFT
+        if workers > 1:
+            parameters.update(workers=0, fft_workers=1)
+        return parameters
+
+    rows = []
+    if workers > 1 and len(jobs) > 1:
+        # 岛屿模型等任务自身占用多个进程，按最多的进程数减少同时运行的任务数，总进程数不超过workers
+        concurrent = max(1, workers // max(job_processes(job_parameters(job)) for job in jobs))
+        with ProcessPoolExecutor(max_workers=min(concurrent, len(jobs))) as executor:
+            futures = [executor.submit(execute_job, job, job_parameters(job), output_dir) for job in jobs]
+            for future in as_completed(futures):
+                rows.append(future.result())
+                print(f"[{len(rows)}/{len(jobs)}] {rows[-1]['name']}: {rows[-1]['status']}")
+    else:
+        for job in jobs:
+            rows.append(execute_job(job, job_parameters(job), output_dir))
+            print(f"[{len(rows)}/{len(jobs)}] {rows[-1]['name']}: {rows[-1]['status']}")
+
+    # 按清单顺序输出汇总
+    order = {job["name"]: index for index, job in enumerate(jobs)}
+    summary = pd.DataFrame(rows)
+    if not summary.empty:
+        summary = summary.sort_values("name", key=lambda names: names.map(order)).reset_index(drop=True)
+    summary.to_csv(os.path.join(output_dir, "summary.csv"), index=False)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量执行光刻掩膜优化")
+    parser.add_argument("manifest", help="任务清单文件（YAML/JSON/CSV）")
+    parser.add_argument("-o", "--output", default="batch_results", help="结果输出目录")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="并行进程数，默认为CPU核心数")
+    parser.add_argument("--engine", default=None, help="优化引擎: ga / island / adam / lbfgs")
+    parser.add_argument("--generations", type=int, default=None, help="迭代次数")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    if args.engine is not None:
+        overrides["optimizer_engine"] = args.engine
+    if args.generations is not None:
+        overrides["generations"] = overrides["ilt_iterations"] = args.generations
+    if args.seed is not None:
+        overrides["seed"] = args.seed
+
+    summary = run_batch(args.manifest, args.output, args.workers, overrides)
+    failed = int((summary["status"] != "ok").sum()) if not summary.empty else 0
+    print(f"完成 {len(summary) - failed} 个任务，失败 {failed} 个，结果保存在 {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
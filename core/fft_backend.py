@@ -0,0 +1,241 @@
+import atexit
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+import scipy.fft
+
+try:
+    import pyfftw
+    import pyfftw.builders
+except ImportError:  # pyFFTW为可选依赖
+    pyfftw = None
+
+DEFAULT_FFT_BACKEND = "scipy"
+DEFAULT_FFT_WORKERS = -1  # -1表示使用全部CPU核心
+
+
+def _resolve_threads(workers):
+    if workers is None or workers < 0:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+class ScipyFFTBackend:
+    """scipy.fft后端，通过workers参数启用多线程"""
+    name = "scipy"
+
+    def __init__(self, workers=DEFAULT_FFT_WORKERS):
+        self.workers = _resolve_threads(workers)
+
+    def fft2(self, x, axes=(-2, -1)):
+        return scipy.fft.fft2(x, axes=axes, workers=self.workers)
+
+    def ifft2(self, x, axes=(-2, -1)):
+        return scipy.fft.ifft2(x, axes=axes, workers=self.workers)
+
+    def rfft2(self, x, axes=(-2, -1)):
+        return scipy.fft.rfft2(x, axes=axes, workers=self.workers)
+
+    def irfft2(self, x, s, axes=(-2, -1)):
+        return scipy.fft.irfft2(x, s=s, axes=axes, workers=self.workers)
+
+
+class NumpyFFTBackend:
+    """numpy.fft后端，单线程，作为兜底实现"""
+    name = "numpy"
+
+    def __init__(self, workers=DEFAULT_FFT_WORKERS):
+        self.workers = 1
+
+    def fft2(self, x, axes=(-2, -1)):
+        return np.fft.fft2(x, axes=axes)
+
+    def ifft2(self, x, axes=(-2, -1)):
+        return np.fft.ifft2(x, axes=axes)
+
+    def rfft2(self, x, axes=(-2, -1)):
+        return np.fft.rfft2(x, axes=axes)
+
+    def irfft2(self, x, s, axes=(-2, -1)):
+        return np.fft.irfft2(x, s=s, axes=axes)
+
+
+class PyFFTWBackend:
+    """pyFFTW后端，按(变换类型, 单幅图像形状, 数据类型)缓存FFTW计划并可持久化wisdom
+
+    计划只针对单幅图像建立，批量输入逐幅执行，批大小（每代未命中缓存的个体数）变化时
+    不会重新做FFTW_MEASURE规划。计划持有固定的输入/输出缓冲区，同一时刻只能由一个线程使用：
+    空闲的计划放回共享的计划池，各线程（各会话）之间复用，并发时才另建计划。
+    wisdom在进程退出时保存一次（有新计划时）。
+    """
+    name = "pyfftw"
+
+    def __init__(self, workers=DEFAULT_FFT_WORKERS, planner_effort="FFTW_MEASURE", wisdom_path=None):
+        if pyfftw is None:
+            raise ImportError("未安装pyFFTW，无法使用pyfftw后端")
+        self.workers = _resolve_threads(workers)
+        self.planner_effort = planner_effort
+        # 在构造时读取环境变量，导入模块之后设置的FFTW_WISDOM_PATH同样生效
+        self.wisdom_path = wisdom_path or os.environ.get("FFTW_WISDOM_PATH")
+        self._idle_plans = {}
+        self._plans_lock = threading.Lock()
+        self._wisdom_lock = threading.Lock()
+        self._new_plans = False
+        if self.wisdom_path:
+            if os.path.exists(self.wisdom_path):
+                self.load_wisdom(self.wisdom_path)
+            atexit.register(self._save_new_wisdom)
+
+    def _acquire_plan(self, key, kind, shape, dtype, s):
+        with self._plans_lock:
+            idle = self._idle_plans.get(key)
+            if idle:
+                return idle.pop()
+            self._new_plans = True
+        builder = getattr(pyfftw.builders, kind)
+        template = pyfftw.empty_aligned(shape, dtype=dtype)
+        kwargs = {"axes": (-2, -1), "threads": self.workers, "planner_effort": self.planner_effort}
+        if s is not None:
+            kwargs["s"] = s
+        return builder(template, **kwargs)
+
+    def _release_plan(self, key, plan):
+        with self._plans_lock:
+            self._idle_plans.setdefault(key, []).append(plan)
+
+    def _execute(self, kind, x, axes, s=None):
+        ndim = x.ndim
+        if tuple(axis % ndim for axis in axes) != (ndim - 2, ndim - 1):
+            raise ValueError("pyfftw后端只支持在最后两维上变换")
+        image_shape = x.shape[-2:]
+        key = (kind, image_shape, x.dtype.str, s)
+        plan = self._acquire_plan(key, kind, image_shape, x.dtype, s)
+        try:
+            images = x.reshape((-1,) + image_shape)
+            output = None
+            for index, image in enumerate(images):
+                result = plan(image)
+                if output is None:
+                    output = np.empty((len(images),) + result.shape, dtype=result.dtype)
+                # 计划的输出数组会在下次调用时被覆盖，逐幅复制到结果中
+                output[index] = result
+        finally:
+            self._release_plan(key, plan)
+        return output.reshape(x.shape[:-2] + output.shape[-2:])
+
+    def fft2(self, x, axes=(-2, -1)):
+        return self._execute("fft2", x, axes)
+
+    def ifft2(self, x, axes=(-2, -1)):
+        return self._execute("ifft2", x, axes)
+
+    def rfft2(self, x, axes=(-2, -1)):
+        return self._execute("rfft2", x, axes)
+
+    def irfft2(self, x, s, axes=(-2, -1)):
+        return self._execute("irfft2", x, axes, s=tuple(s))
+
+    def load_wisdom(self, path):
+        with open(path, "rb") as f:
+            pyfftw.import_wisdom(pickle.load(f))
+
+    def _save_new_wisdom(self):
+        if self._new_plans:
+            self.save_wisdom()
+
+    def save_wisdom(self, path=None):
+        path = path or self.wisdom_path
+        if not path:
+            return
+        with self._wisdom_lock:
+            # 先写临时文件再改名，其他进程不会读到写了一半的wisdom
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                pickle.dump(pyfftw.export_wisdom(), f)
+            os.replace(temporary, path)
+
+
+FFT_BACKENDS = {
+    "scipy": ScipyFFTBackend,
+    "pyfftw": PyFFTWBackend,
+    "numpy": NumpyFFTBackend,
+}
+
+# 后端实例按(名称, 线程数)复用，以便保留各自的计划缓存
+_backend_instances = {}
+# 自动选择的结果按(形状, 线程数, 变换类型, 数据类型)缓存
+_autotune_results = {}
+
+
+def available_backends():
+    return [name for name in FFT_BACKENDS if name != "pyfftw" or pyfftw is not None]
+
+
+def _get_instance(name, workers):
+    key = (name, workers)
+    backend = _backend_instances.get(key)
+    if backend is None:
+        backend = FFT_BACKENDS[name](workers)
+        _backend_instances[key] = backend
+    return backend
+
+
+def _round_trip(backend, sample, real):
+    if real:
+        return backend.irfft2(backend.rfft2(sample), s=sample.shape)
+    return backend.ifft2(backend.fft2(sample))
+
+
+def autotune_fft_backend(shape, workers=DEFAULT_FFT_WORKERS, real=True, dtype=np.float64, repeats=3):
+    """对给定形状逐一测量可用后端的正逆变换耗时，返回最快后端的名称
+
+    real为True时测量rfft2+irfft2，否则测量fft2+ifft2；dtype为掩膜的实数类型，
+    与仿真器实际执行的变换一致。
+    """
+    dtype = np.dtype(dtype)
+    key = (tuple(shape), workers, bool(real), dtype.str)
+    if key in _autotune_results:
+        return _autotune_results[key]
+
+    sample = np.random.rand(*shape).astype(dtype)
+    if not real:
+        sample = sample.astype(np.result_type(dtype, np.complex64))
+    timings = {}
+    for name in available_backends():
+        backend = _get_instance(name, workers)
+        # 先执行一次以完成计划创建等预热工作
+        _round_trip(backend, sample, real)
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            _round_trip(backend, sample, real)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    fastest = min(timings, key=timings.get)
+    _autotune_results[key] = fastest
+    print(f"FFT后端自动选择: {fastest} (形状 {tuple(shape)}, 耗时 "
+          + ", ".join(f"{name}={t * 1e3:.3f}ms" for name, t in timings.items()) + ")")
+    return fastest
+
+
+def get_fft_backend(name=DEFAULT_FFT_BACKEND, workers=DEFAULT_FFT_WORKERS, shape=None,
+                    real=True, dtype=np.float64):
+    """按名称获取FFT后端，name为"auto"时按shape与变换类型（real/dtype）自动选择最快的后端"""
+    if name == "auto":
+        if shape is not None:
+            name = autotune_fft_backend(shape, workers, real=real, dtype=dtype)
+        else:
+            name = DEFAULT_FFT_BACKEND
+    if name not in FFT_BACKENDS:
+        raise ValueError(f"未知的FFT后端: {name}")
+    if name == "pyfftw" and pyfftw is None:
+        key = (name, workers)
+        if key not in _backend_instances:
+            print("警告: 未安装pyFFTW，改用scipy后端")
+            _backend_instances[key] = _get_instance("scipy", workers)
+        return _backend_instances[key]
+    return _get_instance(name, workers)
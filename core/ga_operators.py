@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+
+# 遗传算子均直接作用于一维NumPy数组个体，避免逐基因的Python循环
+
+
+def cx_two_point(ind1, ind2):
+    """两点交叉；NumPy切片是视图，交换时必须先复制"""
+    size = min(len(ind1), len(ind2))
+    cxpoint1 = random.randint(1, size)
+    cxpoint2 = random.randint(1, size - 1)
+    if cxpoint2 >= cxpoint1:
+        cxpoint2 += 1
+    else:
+        cxpoint1, cxpoint2 = cxpoint2, cxpoint1
+
+    ind1[cxpoint1:cxpoint2], ind2[cxpoint1:cxpoint2] = \
+        ind2[cxpoint1:cxpoint2].copy(), ind1[cxpoint1:cxpoint2].copy()
+    return ind1, ind2
+
+
+def cx_uniform(ind1, ind2, indpb):
+    """均匀交叉，按概率indpb逐像素交换"""
+    swap = np.random.random(len(ind1)) < indpb
+    ind1[swap], ind2[swap] = ind2[swap], ind1[swap]
+    return ind1, ind2
+
+
+def mut_flip_pixels(individual, indpb):
+    """按位翻转：以概率indpb选中像素，按0.5阈值取反为0或1"""
+    flip = np.random.random(len(individual)) < indpb
+    individual[flip] = individual[flip] <= 0.5
+    return individual,
+
+
+def mut_gaussian_clip(individual, sigma, indpb):
+    """高斯变异：以概率indpb选中像素叠加N(0, sigma)噪声并截断到[0, 1]"""
+    selected = np.flatnonzero(np.random.random(len(individual)) < indpb)
+    individual[selected] += np.random.normal(0, sigma, size=len(selected)).astype(individual.dtype)
+    np.clip(individual, 0, 1, out=individual)
+    return individual,
@@ -1,77 +1,594 @@
+import hashlib
+import multiprocessing
+import random
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
 import numpy as np
 from deap import base, creator, tools, algorithms
-from .lithography_simulation import LithographySimulator
+from .lithography_simulation import LithographySimulator, get_grid_shape
+from .metrics import PatternMetrics
+from utils.image_processing import load_and_preprocess_image
+from .stopping import StoppingCriteria, STOP_MAX_GENERATIONS
+from .ga_operators import cx_two_point, cx_uniform, mut_flip_pixels, mut_gaussian_clip
+
+# 批量评估时单批次的像素总数上限
+MAX_BATCH_ELEMENTS = 1 << 22
+
+# 多分辨率金字塔最粗一层的最小边长
+MIN_PYRAMID_SIZE = 8
+
+# 适应度缓存默认容量（条目数）
+DEFAULT_FITNESS_CACHE_SIZE = 4096
+
+# 默认启用增量适应度评估的最小FFT网格像素数
+MIN_INCREMENTAL_PIXELS = 64 * 64
+
+# 频谱缓存的默认容量（字节），掩膜与频谱副本合计
+DEFAULT_SPECTRUM_CACHE_BYTES = 128 * 1024 * 1024
+
+# 连续增量更新的最大层数，超过后重新做完整FFT，避免舍入误差沿谱系累积
+MAX_INCREMENTAL_DEPTH = 16
+
+# 进程池工作进程内的常驻状态（仿真器及其核缓存、目标图像）
+_worker_state = {}
+
+
+def compute_fitness(simulator, masks, metrics):
+    """对(N, Lx, Ly)掩膜堆叠计算适应度（PatternMetrics.fitness），返回长度为N的数组"""
+    simulated_images = simulator.simulate_batch(masks)
+    # 二值化与误差计算融合在一起，不生成二值图像和浮点差值的临时数组
+    with simulator.profiler.span("fitness.metric"):
+        return metrics.fitness(simulated_images)
+
+
+def fitness_from_spectrum(simulator, spectrum, metrics):
+    """由掩膜频谱（N, Px, Py'）计算适应度，频谱会被原地修改"""
+    simulated_images = simulator.image_from_spectrum(spectrum, metrics.shape, overwrite_spectrum=True)
+    with simulator.profiler.span("fitness.metric"):
+        return metrics.fitness(simulated_images)
+
+
+def default_max_changed_pixels(fft_shape):
+    """增量更新的默认像素数上限，为0时不启用
+
+    k个像素的稀疏更新约需k·N次复数乘加外加约10us的固定开销，批量FFT每幅约需N·log2(N)次运算
+    但常数大约10倍；实测交叉点约为k ≈ 6~10·log2(N)，这里取4·log2(N)留出余量。
+    小于64x64的网格上批量FFT本身只需几微秒，增量更新的固定开销已不划算。
+    """
+    pixels = fft_shape[0] * fft_shape[1]
+    if pixels < MIN_INCREMENTAL_PIXELS:
+        return 0
+    return int(4 * np.log2(pixels))
+
+
+def _init_worker(parameters, target_bytes, seed, counter, population_buffer):
+    """工作进程初始化：建立常驻仿真器、接入共享种群缓冲区，并按进程序号确定性地设置随机种子"""
+    with counter.get_lock():
+        worker_index = counter.value
+        counter.value += 1
+    if seed is not None:
+        random.seed(seed + worker_index)
+        np.random.seed(seed + worker_index)
+
+    # 多个工作进程并行时每个进程只用单线程FFT，避免线程超额订阅
+    parameters = dict(parameters, fft_workers=1)
+    Lx, Ly = get_grid_shape(parameters)
+    _worker_state["simulator"] = LithographySimulator(parameters)
+    target = np.frombuffer(target_bytes, dtype=np.float32).reshape((Lx, Ly))
+    _worker_state["metrics"] = PatternMetrics.from_params(target, parameters)
+    _worker_state["buffer"] = population_buffer
+
+
+def _evaluate_in_worker(bounds):
+    """在工作进程中原地评估共享缓冲区的[start, stop)切片，适应度写回共享向量"""
+    start, stop = bounds
+    population_buffer = _worker_state["buffer"]
+    population_buffer.fitness[start:stop] = compute_fitness(
+        _worker_state["simulator"], population_buffer.masks[start:stop], _worker_state["metrics"])
+
+
+class SharedPopulationBuffer:
+    """共享内存中的种群缓冲区：(容量, Lx, Ly)的float32掩膜数组与等长的适应度向量
+
+    主进程把待评估的个体直接写入masks，工作进程按切片原地读取并把适应度写回fitness，
+    每次评估只传递切片的起止下标，掩膜数据不经过序列化。
+    """
+
+    def __init__(self, capacity, shape):
+        self.capacity = capacity
+        self.shape = tuple(shape)
+        self._owner = True
+        self._masks_memory = shared_memory.SharedMemory(
+            create=True, size=capacity * int(np.prod(self.shape)) * np.dtype(np.float32).itemsize)
+        self._fitness_memory = shared_memory.SharedMemory(
+            create=True, size=capacity * np.dtype(np.float64).itemsize)
+        self._attach()
+
+    def _attach(self):
+        self.masks = np.ndarray((self.capacity,) + self.shape, dtype=np.float32, buffer=self._masks_memory.buf)
+        self.fitness = np.ndarray((self.capacity,), dtype=np.float64, buffer=self._fitness_memory.buf)
+
+    def __getstate__(self):
+        # 以spawn方式启动的工作进程按名称重新接入同一块共享内存
+        return {"capacity": self.capacity, "shape": self.shape,
+                "_masks_memory": self._masks_memory, "_fitness_memory": self._fitness_memory}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._owner = False
+        self._attach()
+
+    def close(self):
+        """释放数组视图并关闭共享内存，创建者同时负责删除"""
+        self.masks = self.fitness = None
+        for memory in (self._masks_memory, self._fitness_memory):
+            memory.close()
+            if self._owner:
+                memory.unlink()
+
+
+class FitnessCache:
+    """以掩膜字节的blake2b摘要为键的适应度缓存，超出容量时按LRU淘汰"""
+
+    def __init__(self, max_entries=DEFAULT_FITNESS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(mask):
+        return hashlib.blake2b(np.ascontiguousarray(mask).tobytes(), digest_size=16).digest()
+
+    def get(self, key):
+        fitness = self._entries.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return fitness
+
+    def put(self, key, fitness):
+        self._entries[key] = fitness
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SpectrumCache(FitnessCache):
+    """以掩膜摘要为键缓存(掩膜, 频谱, 增量层数)，供子代做稀疏频谱更新
+
+    条目数超过max_entries或掩膜与频谱的总字节数超过max_bytes时按LRU淘汰。
+    """
+
+    def __init__(self, max_entries, max_bytes=DEFAULT_SPECTRUM_CACHE_BYTES):
+        super().__init__(max_entries)
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+
+    @staticmethod
+    def entry_bytes(entry):
+        mask, spectrum, _ = entry
+        return mask.nbytes + spectrum.nbytes
+
+    def put(self, key, entry):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.nbytes -= self.entry_bytes(previous)
+        self._entries[key] = entry
+        self.nbytes += self.entry_bytes(entry)
+        while self._entries and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= self.entry_bytes(evicted)
 
 
 class MaskOptimizer:
-    def __init__(self, simulator, target_image):
+    def __init__(self, simulator, target_image, workers=None, seed=None, stopping=None):
         self.simulator = simulator
         self.target_image = target_image
+        self.metrics = PatternMetrics.from_params(target_image, simulator.params)
+        # 多分辨率各层共享同一停止条件，使时间与评估次数预算跨层累计
+        self.shared_stopping = stopping
+        self.stopping = stopping
+        # workers>1时启用进程池并行评估适应度
+        self.workers = workers if workers is not None else simulator.params.get("workers", 0)
+        self.seed = seed if seed is not None else simulator.params.get("seed")
+        self.pool = None
+        self.population_buffer = None
+        self.fitness_cache = FitnessCache(simulator.params.get("fitness_cache_size", DEFAULT_FITNESS_CACHE_SIZE))
+        self.setup_incremental_fitness()
         self.setup_genetic_algorithm()
 
+    def setup_incremental_fitness(self):
+        """增量适应度评估：子代只与父代相差少量像素时，在父代频谱上做稀疏更新代替正变换
+
+        需要显式开启（params["incremental_fitness"]），只在变异很稀疏（如flip变异且
+        mutation_indpb·像素数远小于上限）时才划算，否则只会白白占用频谱缓存的内存。
+        params["incremental_change_ratio"]为变化像素占比的上限，超过时做完整FFT；
+        未给出时按default_max_changed_pixels估算的交叉点确定。只用于单进程评估。
+        频谱缓存按params["spectrum_cache_bytes"]限制总字节数。
+        """
+        params = self.simulator.params
+        self.spectrum_cache = None
+        self.incremental_updates = 0
+        if not params.get("incremental_fitness", False):
+            return
+        Lx, Ly = self.simulator.get_grid_shape()
+        ratio = params.get("incremental_change_ratio")
+        if ratio is None:
+            self.max_changed_pixels = default_max_changed_pixels(self.simulator.get_fft_shape())
+        else:
+            self.max_changed_pixels = int(ratio * Lx * Ly)
+        if self.max_changed_pixels > 0:
+            # 只需保留最近一两代个体的频谱
+            self.spectrum_cache = SpectrumCache(2 * params.get("population_size", 50),
+                                                params.get("spectrum_cache_bytes", DEFAULT_SPECTRUM_CACHE_BYTES))
+
     def setup_genetic_algorithm(self):
-        # 创建适应度函数和个体类
-        creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
-        creator.create("Individual", list, fitness=creator.FitnessMin)
+        # 创建适应度函数和个体类，个体为一维float32数组
+        # creator中的类是全局的，重复创建会触发覆盖警告，只在首次创建
+        if not hasattr(creator, "FitnessMin"):
+            creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+        if not hasattr(creator, "MaskIndividual"):
+            creator.create("MaskIndividual", np.ndarray, fitness=creator.FitnessMin)
 
         self.toolbox = base.Toolbox()
+        params = self.simulator.params
+        indpb = params.get("mutation_indpb", 0.02)
 
-        # 注册遗传算法操作
+        # 注册遗传算法操作，map对适应度评估做整批处理
+        self.toolbox.register("map", self.map_evaluate)
         self.toolbox.register("evaluate", self.evaluate_individual)
-        self.toolbox.register("mate", tools.cxTwoPoint)
-        self.toolbox.register("mutate", tools.mutFlipBit, indpb=0.02)
+        if params.get("crossover_operator", "two_point") == "uniform":
+            self.toolbox.register("mate", cx_uniform, indpb=0.5)
+        else:
+            self.toolbox.register("mate", cx_two_point)
+        if params.get("mutation_operator", "flip") == "gaussian":
+            self.toolbox.register("mutate", mut_gaussian_clip,
+                                  sigma=params.get("mutation_sigma", 0.1), indpb=indpb)
+        else:
+            self.toolbox.register("mutate", mut_flip_pixels, indpb=indpb)
         self.toolbox.register("select", tools.selTournament, tournsize=3)
 
     def create_individual_with_noise(self, initial_mask_flat, noise_scale=0.02):
         noise = np.random.normal(0, noise_scale, size=initial_mask_flat.shape)
-        individual = initial_mask_flat + noise
-        return np.clip(individual, 0, 1)
+        return self.make_individual(np.clip(initial_mask_flat + noise, 0, 1).astype(np.float32))
+
+    @staticmethod
+    def make_individual(flat_mask):
+        """把一维float32数组（不复制）包装为适应度未评估的个体"""
+        # 直接把数组视作个体，避免creator默认构造时逐元素转换为list
+        individual = flat_mask.view(creator.MaskIndividual)
+        individual.fitness = creator.FitnessMin()
+        return individual
 
     def evaluate_individual(self, individual):
-        Lx = Ly = self.simulator.params["image_size"]
-        mask = np.array(individual, dtype=np.float32).reshape((Lx, Ly))
+        return self.evaluate_population([individual])[0]
 
-        # 仿真并计算误差
-        simulated_image = self.simulator.simulate(mask)
-        binary_image = self.simulator.binarize_image(simulated_image)
+    def evaluate_population(self, individuals):
+        """批量计算一组个体的适应度，返回与输入顺序一致的适应度元组列表
 
-        # 计算均方误差
-        PE = np.mean((binary_image.astype(np.float32) - self.target_image.astype(np.float32)) ** 2)
-        return PE,
+        相同的掩膜（包括同一批次内的重复个体）只仿真一次，其余直接查缓存。
+        """
+        fitnesses = [None] * len(individuals)
+        pending = OrderedDict()
+        parents = {}
+        for index, individual in enumerate(individuals):
+            key = self.fitness_cache.make_key(np.asarray(individual, dtype=np.float32))
+            parent_key = getattr(individual, "spectrum_key", None)
+            # 记录个体自身的键，克隆出的子代据此找到父代频谱
+            individual.spectrum_key = key
+            if key in pending:
+                # 本批次内已有相同个体待评估，同样计为命中
+                self.fitness_cache.hits += 1
+                pending[key].append(index)
+                continue
+            cached = self.fitness_cache.get(key)
+            if cached is not None:
+                fitnesses[index] = cached
+            else:
+                pending[key] = [index]
+                parents[key] = parent_key
 
-    def optimize(self, initial_mask, progress_callback=None):
-        Lx = Ly = self.simulator.params["image_size"]
+        if pending:
+            unique = [individuals[indices[0]] for indices in pending.values()]
+            fitnesses_computed = self._compute_fitnesses(unique, list(pending), [parents[key] for key in pending])
+            for (key, indices), fitness in zip(pending.items(), fitnesses_computed):
+                self.fitness_cache.put(key, fitness)
+                for index in indices:
+                    fitnesses[index] = fitness
+        return fitnesses
+
+    def _compute_fitnesses(self, individuals, keys=None, parent_keys=None):
+        """对一组个体实际执行仿真并计算适应度，keys/parent_keys为各个体及其父代的掩膜摘要"""
+        Lx, Ly = self.simulator.get_grid_shape()
+        if self.stopping is not None:
+            self.stopping.evaluations += len(individuals)
+        if self.pool is not None:
+            return self._compute_fitnesses_shared(individuals)
+
+        masks = np.stack(individuals).astype(np.float32, copy=False).reshape((len(individuals), Lx, Ly))
+
+        # 按元素总量分块，避免大尺寸图像时一次性堆叠占用过多内存
+        batch_size = self.simulator.params.get("batch_size") or max(1, MAX_BATCH_ELEMENTS // (Lx * Ly))
+
+        fitnesses = []
+        for start in range(0, len(masks), batch_size):
+            with self.simulator.profiler.span("fitness.batch"):
+                if self.spectrum_cache is not None and keys is not None:
+                    spectrum = self._spectra(masks[start:start + batch_size], keys[start:start + batch_size],
+                                             parent_keys[start:start + batch_size])
+                    PE = fitness_from_spectrum(self.simulator, spectrum, self.metrics)
+                else:
+                    PE = compute_fitness(self.simulator, masks[start:start + batch_size], self.metrics)
+            fitnesses.extend((float(pe),) for pe in PE)
+        return fitnesses
+
+    def _spectra(self, masks, keys, parent_keys):
+        """批量计算掩膜频谱：与父代相比变化像素不超过上限的个体在父代频谱上做稀疏更新，
+        其余个体一起做完整FFT；结果存入频谱缓存供下一代使用"""
+        Ly = masks.shape[-1]
+        real_dtype, _ = self.simulator.get_dtypes()
+        flat_masks = masks.reshape((len(masks), -1))
+        spectra = [None] * len(masks)
+        depths = [0] * len(masks)
+        full = []
+        for index, parent_key in enumerate(parent_keys):
+            # 与父代相同的掩膜（如重复评估同一个体）没有可更新的像素，直接做完整FFT
+            if parent_key is None or parent_key == keys[index]:
+                entry = None
+            else:
+                entry = self.spectrum_cache.get(parent_key)
+            if entry is not None and entry[2] < MAX_INCREMENTAL_DEPTH:
+                parent_mask, parent_spectrum, depth = entry
+                changed = np.flatnonzero(flat_masks[index] != parent_mask)
+                if len(changed) <= self.max_changed_pixels:
+                    rows, cols = np.divmod(changed, Ly)
+                    # 两个float32之差在仿真精度下精确表示
+                    deltas = flat_masks[index, changed].astype(real_dtype) - parent_mask[changed].astype(real_dtype)
+                    spectra[index] = self.simulator.update_spectrum(parent_spectrum, rows, cols, deltas)
+                    depths[index] = depth + 1
+                    self.incremental_updates += 1
+                    continue
+            full.append(index)
+
+        if full:
+            for index, spectrum in zip(full, self.simulator.forward_spectrum(masks[full])):
+                # 复制出独立的数组，缓存淘汰后整批频谱能及时释放，字节计数也与实际占用一致
+                spectra[index] = spectrum.copy()
+
+        for key, mask, spectrum, depth in zip(keys, flat_masks, spectra, depths):
+            self.spectrum_cache.put(key, (mask.copy(), spectrum, depth))
+        return np.stack(spectra)
 
+    def _compute_fitnesses_shared(self, individuals):
+        """进程池评估：个体写入共享种群缓冲区，工作进程各自原地评估一段切片"""
+        population_buffer = self.population_buffer
+        flat_masks = population_buffer.masks.reshape((population_buffer.capacity, -1))
+        fitnesses = []
+        for start in range(0, len(individuals), population_buffer.capacity):
+            batch = individuals[start:start + population_buffer.capacity]
+            count = len(batch)
+            np.stack(batch, out=flat_masks[:count])
+
+            # 按工作进程数切分下标区间，只有区间端点跨进程传输
+            bounds = np.linspace(0, count, min(self.workers, count) + 1).astype(int)
+            with self.simulator.profiler.span("fitness.pool"):
+                self.pool.map(_evaluate_in_worker, list(zip(bounds[:-1].tolist(), bounds[1:].tolist())))
+            fitnesses.extend((float(pe),) for pe in population_buffer.fitness[:count])
+        return fitnesses
+
+    def map_evaluate(self, func, iterable):
+        """toolbox.map的替代实现：适应度评估整代一次完成，其余调用退回内置map"""
+        if func is self.toolbox.evaluate:
+            with self.simulator.profiler.span("fitness.population"):
+                return self.evaluate_population(list(iterable))
+        return list(map(func, iterable))
+
+    def init_population(self, initial_mask):
+        """以初始掩膜加小幅噪声创建种群"""
         # 确保初始掩膜在0-1范围内
         initial_mask = np.clip(initial_mask, 0, 1)
 
-        # 设置初始种群
-        self.toolbox.register("individual", tools.initIterate, creator.Individual,
-                              lambda: self.create_individual_with_noise(initial_mask.flatten()))
+        self.toolbox.register("individual", self.create_individual_with_noise, initial_mask.flatten())
         self.toolbox.register("population", tools.initRepeat, list, self.toolbox.individual)
 
-        # 创建种群
         pop_size = self.simulator.params.get("population_size", 50)
-        pop = self.toolbox.population(n=pop_size)
+        self.population = self.toolbox.population(n=pop_size)
+        return self.population
 
-        # 设置统计和精英保留
-        hof = tools.HallOfFame(1)
+    def make_statistics(self):
         stats = tools.Statistics(lambda ind: ind.fitness.values)
         stats.register("avg", np.mean)
         stats.register("min", np.min)
         stats.register("max", np.max)
+        # 在运行日志中显示适应度缓存的累计命中/未命中次数
+        stats.register("hits", lambda _: self.fitness_cache.hits)
+        stats.register("misses", lambda _: self.fitness_cache.misses)
+        return stats
+
+    def evolve(self, cxpb, mutpb):
+        """选择并产生下一代（与eaSimple相同的varAnd流程）"""
+        with self.simulator.profiler.span("ga.select"):
+            offspring = self.toolbox.select(self.population, len(self.population))
+        with self.simulator.profiler.span("ga.variation"):
+            self.population[:] = algorithms.varAnd(offspring, self.toolbox, cxpb, mutpb)
+
+    def evaluate_invalid(self):
+        """评估适应度失效的个体，返回评估的个体数"""
+        invalid_ind = [ind for ind in self.population if not ind.fitness.valid]
+        fitnesses = self.toolbox.map(self.toolbox.evaluate, invalid_ind)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+        return len(invalid_ind)
+
+    def start_pool(self):
+        """启动评估进程池与共享种群缓冲区，工作进程在整个优化过程中常驻"""
+        target_bytes = np.ascontiguousarray(self.target_image, dtype=np.float32).tobytes()
+        counter = multiprocessing.Value("i", 0)
+        # 每代待评估的个体数不超过种群规模
+        capacity = self.simulator.params.get("population_size", 50)
+        self.population_buffer = SharedPopulationBuffer(capacity, self.simulator.get_grid_shape())
+        # "auto"只在主进程中选择一次，所有工作进程使用同一后端，结果可复现
+        parameters = dict(self.simulator.params, fft_backend=self.simulator.get_fft().name)
+        self.pool = multiprocessing.Pool(
+            processes=self.workers,
+            initializer=_init_worker,
+            initargs=(parameters, target_bytes, self.seed, counter, self.population_buffer)
+        )
+
+    def close_pool(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.population_buffer is not None:
+            self.population_buffer.close()
+            self.population_buffer = None
+
+    def pyramid_schedule(self):
+        """多分辨率金字塔的各层网格形状与迭代次数，由粗到细
+
+        每层长边减半、短边按比例缩放；总迭代次数按2:1逐层递减分配，粗层计算便宜，
+        分得更多代数。可通过params["pyramid_generations"]显式给出每层的代数。
+        """
+        params = self.simulator.params
+        levels = int(params.get("pyramid_levels", 1))
+        Lx, Ly = get_grid_shape(params)
+        long_side = max(Lx, Ly)
+        sizes = []
+        for level in range(levels):
+            size = max(MIN_PYRAMID_SIZE, long_side >> (levels - 1 - level))
+            sizes.append((max(1, round(Lx * size / long_side)), max(1, round(Ly * size / long_side))))
+        sizes[-1] = (Lx, Ly)
+
+        generations = params.get("pyramid_generations")
+        if generations is None:
+            total = params.get("generations", 20)
+            weights = [2 ** (levels - 1 - level) for level in range(levels)]
+            generations = [max(1, round(total * w / sum(weights))) for w in weights]
+        return list(zip(sizes, generations))
+
+    def iterate_pyramid(self, initial_mask):
+        """由粗到细的多分辨率优化：每层最优掩膜上采样后作为下一层的初始掩膜"""
+        params = self.simulator.params
+        grid_shape = get_grid_shape(params)
+        schedule = self.pyramid_schedule()
+        total = sum(ngen + 1 for _, ngen in schedule) - 1
+
+        stopping = self.shared_stopping or StoppingCriteria.from_params(params)
+        self.stopping = stopping
+
+        log = tools.Logbook()
+        mask = initial_mask
+        gen_offset = 0
+        for level, (size, ngen) in enumerate(schedule):
+            # 粗层像素尺寸按比例放大，保持仿真的物理视场不变
+            level_params = dict(params, image_size=max(size), image_shape=size, generations=ngen,
+                                pyramid_levels=1,
+                                pixel_size=params["pixel_size"] * max(grid_shape) / max(size))
+            level_simulator = LithographySimulator(level_params, kernel_cache=self.simulator.kernel_cache,
+                                                   profiler=self.simulator.profiler)
+            level_target = load_and_preprocess_image(np.asarray(self.target_image, dtype=np.float32), size)
+            level_mask = load_and_preprocess_image(np.asarray(mask, dtype=np.float32), size)
+
+            print(f"金字塔第 {level + 1} 层: {size[0]}x{size[1]}, {ngen} 代")
+            level_optimizer = MaskOptimizer(level_simulator, level_target, workers=self.workers,
+                                            seed=self.seed, stopping=stopping)
+            for progress in level_optimizer.iterate(level_mask):
+                record = progress["record"]
+                log.record(**dict(record, gen=gen_offset + record["gen"], level=level, size=max(size)))
+                # 粗层的停止只结束该层；时间/评估预算耗尽时整个金字塔结束
+                log.stop_reason = progress["stop_reason"]
+                mask = progress["best_mask"]
+                # 对外统一给出全分辨率的当前最优掩膜
+                if size != grid_shape:
+                    best_mask = load_and_preprocess_image(mask, grid_shape)
+                else:
+                    best_mask = mask
+                yield dict(progress, generation=gen_offset + progress["generation"], total=total,
+                           record=log[-1], best_mask=best_mask, log=log)
+            gen_offset += ngen + 1
+            if stopping.budget_exhausted():
+                break
+
+    def iterate(self, initial_mask):
+        """逐代运行遗传算法的生成器
+
+        每完成一代产出一个进度字典：generation、total、当代统计record、
+        当前最优掩膜best_mask以及累计日志log。调用方可随时停止迭代，
+        已完成的计算结果保留在最后一次产出中。
+        """
+        if self.simulator.params.get("pyramid_levels", 1) > 1:
+            yield from self.iterate_pyramid(initial_mask)
+            return
+
+        Lx, Ly = self.simulator.get_grid_shape()
+
+        # 固定随机种子以保证结果可复现
+        if self.seed is not None:
+            random.seed(self.seed)
+            np.random.seed(self.seed)
+
+        self.init_population(initial_mask)
+
+        # 设置统计和精英保留
+        hof = tools.HallOfFame(1, similar=np.array_equal)
+        stats = self.make_statistics()
+
+        log = tools.Logbook()
+        log.header = ["gen", "nevals"] + stats.fields
+
+        # 提前停止条件，停止原因记录在log.stop_reason中
+        if self.shared_stopping is None:
+            self.stopping = StoppingCriteria.from_params(self.simulator.params)
+        else:
+            self.stopping.reset_plateau()
 
         # 运行遗传算法
         cxpb = self.simulator.params.get("crossover_rate", 0.4)
         mutpb = self.simulator.params.get("mutation_rate", 0.4)
         ngen = self.simulator.params.get("generations", 20)
 
-        # 运行遗传算法并捕获日志
-        pop, log = algorithms.eaSimple(pop, self.toolbox, cxpb=cxpb, mutpb=mutpb,
-                                       ngen=ngen, stats=stats, halloffame=hof, verbose=True)
+        if self.workers and self.workers > 1:
+            self.start_pool()
+        try:
+            for gen in range(ngen + 1):
+                if gen > 0:
+                    self.evolve(cxpb, mutpb)
+                nevals = self.evaluate_invalid()
 
-        # 返回最优个体和日志
-        best_mask = np.array(hof[0], dtype=np.float32).reshape((Lx, Ly))
-        best_mask = np.clip(best_mask, 0, 1)
+                hof.update(self.population)
+                log.record(gen=gen, nevals=nevals, **stats.compile(self.population))
+                print(log.stream)
 
-        return best_mask, log
\ No newline at end of file
+                reason = self.stopping.check(hof[0].fitness.values[0])
+                if reason is None and gen == ngen:
+                    reason = STOP_MAX_GENERATIONS
+                log.stop_reason = reason
+
+                best_mask = np.clip(np.array(hof[0], dtype=np.float32).reshape((Lx, Ly)), 0, 1)
+                yield {"generation": gen, "total": ngen, "record": log[-1],
+                       "best_mask": best_mask, "log": log, "stop_reason": reason}
+                if reason is not None:
+                    print(f"优化停止: {reason}（第 {gen} 代）")
+                    break
+        finally:
+            self.close_pool()
+            print(f"适应度缓存: 命中 {self.fitness_cache.hits} 次, 未命中 {self.fitness_cache.misses} 次")
+            if self.spectrum_cache is not None:
+                print(f"增量频谱更新: {self.incremental_updates} 次")
+
+    def optimize(self, initial_mask, progress_callback=None):
+        progress = None
+        for progress in self.iterate(initial_mask):
+            if progress_callback is not None:
+                progress_callback(progress)
+
+        # 返回最优个体和日志
+        return progress["best_mask"], progress["log"]
@@ -0,0 +1,211 @@
+import numpy as np
+from deap import tools
+
+from .metrics import PatternMetrics
+from .resist_model import ResistModel, sigmoid
+from .stopping import StoppingCriteria, STOP_MAX_GENERATIONS
+
+# 掩膜参数化 m = sigmoid(MASK_STEEPNESS * theta)，保证掩膜始终落在(0, 1)内
+DEFAULT_MASK_STEEPNESS = 4.0
+DEFAULT_ILT_ITERATIONS = 50
+
+
+class GradientMaskOptimizer:
+    """基于梯度的逆光刻掩膜优化（ILT）
+
+    以sigmoid松弛的光刻胶模型代替硬阈值二值化，沿LithographySimulator的
+    FFT成像链路解析地计算伴随梯度，再用Adam或L-BFGS更新掩膜参数。
+    与MaskOptimizer保持相同的optimize(initial_mask, progress_callback)接口。
+    """
+
+    def __init__(self, simulator, target_image, method="adam"):
+        self.simulator = simulator
+        self.target_image = target_image
+        self.resist = ResistModel.from_params(simulator.params)
+        self.metrics = PatternMetrics(target_image, resist=self.resist)
+        self.method = method
+
+        params = simulator.params
+        self.iterations = int(params.get("ilt_iterations", DEFAULT_ILT_ITERATIONS))
+        self.learning_rate = params.get("ilt_learning_rate", 0.1)
+        self.mask_steepness = params.get("ilt_mask_steepness", DEFAULT_MASK_STEEPNESS)
+        self.evaluations = 0
+
+    def mask_from_theta(self, theta):
+        return sigmoid(self.mask_steepness * theta)
+
+    def theta_from_mask(self, mask):
+        mask = np.clip(mask, 0.05, 0.95)
+        return np.log(mask / (1 - mask)) / self.mask_steepness
+
+    def loss_and_gradient(self, theta):
+        """返回(松弛损失, 对theta的梯度, 硬阈值下的图形误差)"""
+        fft = self.simulator.get_fft()
+        _, complex_dtype = self.simulator.get_dtypes()
+        entry = self.simulator.get_kernel()
+        kernels = entry.full(complex_dtype)
+        target = self.target_image
+        self.evaluations += 1
+
+        mask = self.mask_from_theta(theta)
+        Lx, Ly = mask.shape
+        profiler = self.simulator.profiler
+
+        # 正向成像：标量模式取场幅度，SOCS模式取各相干核强度的加权和
+        with profiler.span("ilt.forward"):
+            spectrum = fft.fft2(self.simulator.pad_to_fft(mask))
+            fields = [fft.ifft2(spectrum * kernel) for kernel in kernels]
+        if entry.weights is None:
+            aerial = np.abs(fields[0])
+        else:
+            aerial = sum(w * (field.real ** 2 + field.imag ** 2) for w, field in zip(entry.weights, fields))
+        # 补零区域不参与损失，只取原网格部分
+        padded_aerial, aerial = aerial, aerial[:Lx, :Ly]
+
+        # 按最大强度归一化；最大强度同样依赖theta，反向计算时计入其梯度
+        peak = np.unravel_index(np.argmax(aerial), aerial.shape)
+        scale = aerial[peak]
+        if scale <= 0:
+            scale = 1.0
+        normalized = aerial / scale
+
+        # sigmoid光刻胶模型与均方误差
+        resist = self.resist.develop_normalized(normalized)
+        loss = np.mean((resist - target) ** 2)
+        # 硬阈值下的平均图形误差，与遗传算法的适应度一致（normalized的最大值为1）
+        hard_error = self.metrics.pattern_error(normalized, normalize=True)
+
+        # 伴随（反向）计算
+        grad_resist = 2.0 * (resist - target) / resist.size
+        grad_normalized = grad_resist * self.resist.derivative(resist)
+        grad_aerial = np.zeros(padded_aerial.shape)
+        grad_aerial[:Lx, :Ly] = grad_normalized / scale
+        if aerial[peak] > 0:
+            # normalized = aerial / aerial[peak]，对峰值像素的偏导为 -Σ(g·aerial) / scale²
+            grad_aerial[peak] -= np.vdot(grad_normalized, aerial) / scale ** 2
+
+        with profiler.span("ilt.adjoint"):
+            grad_spectrum = np.zeros_like(spectrum)
+            if entry.weights is None:
+                field = fields[0]
+                magnitude = np.where(padded_aerial > 0, padded_aerial, 1.0)
+                grad_field = grad_aerial * field / magnitude
+                grad_spectrum += np.conj(kernels[0]) * fft.fft2(grad_field)
+            else:
+                for kernel, weight, field in zip(kernels, entry.weights, fields):
+                    grad_field = 2.0 * weight * grad_aerial * field
+                    grad_spectrum += np.conj(kernel) * fft.fft2(grad_field)
+            grad_mask = np.real(fft.ifft2(grad_spectrum))[:Lx, :Ly]
+
+        grad_theta = grad_mask * self.mask_steepness * mask * (1 - mask)
+        return loss, grad_theta, hard_error
+
+    def iterate(self, initial_mask):
+        """逐次迭代的生成器，进度字典格式与MaskOptimizer.iterate一致"""
+        Lx, Ly = self.simulator.get_grid_shape()
+        theta = self.theta_from_mask(np.clip(initial_mask, 0, 1).astype(np.float64))
+
+        log = tools.Logbook()
+        log.header = ["gen", "nevals", "avg", "min", "max", "loss"]
+        best_theta, best_error = theta.copy(), np.inf
+        stopping = StoppingCriteria.from_params(self.simulator.params)
+        self.evaluations = 0
+
+        step = self._adam_steps if self.method == "adam" else self._lbfgs_steps
+        for iteration, (theta, loss, hard_error) in enumerate(step(theta)):
+            if hard_error < best_error:
+                best_theta, best_error = theta.copy(), hard_error
+            # 单一候选解，最小/平均/最大均为当前的图形误差
+            log.record(gen=iteration, nevals=self.evaluations, avg=hard_error,
+                       min=hard_error, max=hard_error, loss=loss)
+            print(log.stream)
+
+            stopping.evaluations = self.evaluations
+            reason = stopping.check(best_error)
+            if reason is None and iteration == self.iterations:
+                reason = STOP_MAX_GENERATIONS
+            log.stop_reason = reason
+
+            best_mask = self.mask_from_theta(best_theta).astype(np.float32).reshape((Lx, Ly))
+            yield {"generation": iteration, "total": self.iterations, "record": log[-1],
+                   "best_mask": best_mask, "log": log, "stop_reason": reason}
+            if reason is not None:
+                print(f"优化停止: {reason}（第 {iteration} 次迭代）")
+                break
+
+    def optimize(self, initial_mask, progress_callback=None):
+        progress = None
+        for progress in self.iterate(initial_mask):
+            if progress_callback is not None:
+                progress_callback(progress)
+        return progress["best_mask"], progress["log"]
+
+    def _adam_steps(self, theta, beta1=0.9, beta2=0.999, eps=1e-8):
+        m = np.zeros_like(theta)
+        v = np.zeros_like(theta)
+        loss, grad, hard_error = self.loss_and_gradient(theta)
+        yield theta, loss, hard_error
+        for t in range(1, self.iterations + 1):
+            m = beta1 * m + (1 - beta1) * grad
+            v = beta2 * v + (1 - beta2) * grad ** 2
+            m_hat = m / (1 - beta1 ** t)
+            v_hat = v / (1 - beta2 ** t)
+            theta = theta - self.learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+            loss, grad, hard_error = self.loss_and_gradient(theta)
+            yield theta, loss, hard_error
+
+    def _lbfgs_steps(self, theta, history=10, c1=1e-4, max_backtracks=20):
+        """L-BFGS：双循环递推求搜索方向，Armijo回溯线搜索"""
+        s_list, y_list = [], []
+        loss, grad, hard_error = self.loss_and_gradient(theta)
+        yield theta, loss, hard_error
+        for _ in range(self.iterations):
+            # 双循环递推
+            q = grad.copy()
+            alphas = []
+            for s, y in zip(reversed(s_list), reversed(y_list)):
+                rho = 1.0 / np.vdot(y, s)
+                alpha = rho * np.vdot(s, q)
+                q -= alpha * y
+                alphas.append((rho, alpha))
+            if s_list:
+                q *= np.vdot(s_list[-1], y_list[-1]) / np.vdot(y_list[-1], y_list[-1])
+            else:
+                # 首步按梯度最大分量缩放，使单步变化量与学习率相当
+                q *= self.learning_rate / max(np.max(np.abs(grad)), 1e-12)
+            for (s, y), (rho, alpha) in zip(zip(s_list, y_list), reversed(alphas)):
+                beta = rho * np.vdot(y, q)
+                q += (alpha - beta) * s
+            direction = -q
+
+            slope = np.vdot(grad, direction)
+            if slope >= 0:
+                # 方向非下降时重置历史并退回梯度方向
+                s_list, y_list = [], []
+                direction = -grad * self.learning_rate / max(np.max(np.abs(grad)), 1e-12)
+                slope = np.vdot(grad, direction)
+
+            step = 1.0
+            accepted = False
+            for _ in range(max_backtracks):
+                new_theta = theta + step * direction
+                new_loss, new_grad, new_hard_error = self.loss_and_gradient(new_theta)
+                if new_loss <= loss + c1 * step * slope:
+                    accepted = True
+                    break
+                step *= 0.5
+            if not accepted:
+                # 回溯后仍不满足Armijo条件：保留当前解，清空曲率历史，下一步从梯度方向重新开始
+                s_list, y_list = [], []
+                yield theta, loss, hard_error
+                continue
+
+            s, y = new_theta - theta, new_grad - grad
+            if np.vdot(y, s) > 1e-12:
+                s_list.append(s)
+                y_list.append(y)
+                if len(s_list) > history:
+                    s_list.pop(0)
+                    y_list.pop(0)
+            theta, loss, grad, hard_error = new_theta, new_loss, new_grad, new_hard_error
+            yield theta, loss, hard_error
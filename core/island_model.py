@@ -0,0 +1,258 @@
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+from deap import tools
+
+from .genetic_algorithm import MaskOptimizer
+from .lithography_simulation import LithographySimulator
+from .stopping import StoppingCriteria, STOP_MAX_GENERATIONS
+
+# 默认岛屿数，固定值使每代的计算量与固定种子下的结果不随机器核心数变化
+DEFAULT_ISLANDS = 4
+# 默认每隔多少代迁移一次、每次迁移的个体数
+DEFAULT_MIGRATION_INTERVAL = 5
+DEFAULT_MIGRATION_SIZE = 2
+
+# 等待岛屿进程汇报的轮询间隔（秒），用于及时发现异常退出的进程
+POLL_INTERVAL = 1.0
+
+
+def default_island_count(params):
+    """岛屿数：params["islands"]，未给出时为DEFAULT_ISLANDS，至少为2
+
+    岛屿数决定子种群划分与每代计算量，会影响结果，因此不随机器核心数或负载变化；
+    每个岛屿占用一个进程，由任务队列与批处理按此数目预留CPU核心。
+    """
+    return max(2, int(params.get("islands") or DEFAULT_ISLANDS))
+
+
+def process_context():
+    """岛屿进程的启动方式：不使用fork
+
+    界面在多线程的工作线程中启动任务，fork出的子进程可能继承其他线程持有的锁
+    （如核缓存、DFT矩阵缓存的锁）而永久阻塞；forkserver/spawn从干净的进程启动。
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # forkserver进程预先导入本模块（numpy、scipy、deap），岛屿进程由其fork，启动时无需重复导入
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _migrate(optimizer, index, migrants, fitness, barrier):
+    """环形拓扑迁移：写出本岛最优的m个个体，读入上一个岛的个体替换本岛最差的m个
+
+    迁移区为共享内存中(岛屿数, m, 像素数)的float32掩膜与(岛屿数, m)的float64适应度，
+    迁入个体保留原适应度，无需重新评估，名人堂的比较也不受舍入影响。
+    两次barrier保证所有岛写完后才读取、读完后才进入下一次写入。
+    """
+    population = optimizer.population
+    size = migrants.shape[1]
+    for slot, individual in enumerate(tools.selBest(population, size)):
+        migrants[index, slot] = individual
+        fitness[index, slot] = individual.fitness.values[0]
+    barrier.wait()
+    source = (index - 1) % len(migrants)
+    incoming, incoming_fitness = migrants[source].copy(), fitness[source].copy()
+    barrier.wait()
+
+    worst = np.argsort([ind.fitness.values[0] for ind in population])[::-1][:size]
+    for position, row, value in zip(worst, incoming, incoming_fitness):
+        individual = optimizer.make_individual(row)
+        individual.fitness.values = (float(value),)
+        population[position] = individual
+
+
+def _run_island(index, parameters, initial_mask, target, seed, shared, migrants_shape,
+                barrier, reports, stop_event):
+    """岛屿进程：独立的仿真器、核缓存与子种群，每代向主进程汇报统计与最优掩膜"""
+    migrants_memory, fitness_memory = shared
+    migrants = np.ndarray(migrants_shape, dtype=np.float32, buffer=migrants_memory.buf)
+    fitness = np.ndarray(migrants_shape[:2], dtype=np.float64, buffer=fitness_memory.buf)
+    try:
+        random.seed(seed)
+        np.random.seed(seed)
+        simulator = LithographySimulator(parameters)
+        optimizer = MaskOptimizer(simulator, target, workers=0, seed=seed)
+        optimizer.init_population(initial_mask)
+        stats = optimizer.make_statistics()
+
+        cxpb = parameters.get("crossover_rate", 0.4)
+        mutpb = parameters.get("mutation_rate", 0.4)
+        ngen = parameters.get("generations", 20)
+        interval = parameters.get("migration_interval", DEFAULT_MIGRATION_INTERVAL)
+
+        hof = tools.HallOfFame(1, similar=np.array_equal)
+        reported_best = float("inf")
+        for gen in range(ngen + 1):
+            if stop_event.is_set():
+                break
+            if gen > 0:
+                optimizer.evolve(cxpb, mutpb)
+            nevals = optimizer.evaluate_invalid()
+            hof.update(optimizer.population)
+
+            # 只在本岛最优个体改进时传递掩膜
+            best = hof[0].fitness.values[0]
+            best_mask = None
+            if best < reported_best:
+                reported_best = best
+                best_mask = np.asarray(hof[0], dtype=np.float32).tobytes()
+            reports.put(("record", index, gen, dict(stats.compile(optimizer.population), nevals=nevals),
+                         best, best_mask))
+
+            if len(migrants) > 1 and 0 < gen < ngen and gen % interval == 0:
+                _migrate(optimizer, index, migrants, fitness, barrier)
+    except threading.BrokenBarrierError:
+        # 主进程提前结束运行时会中止barrier
+        pass
+    except Exception:
+        barrier.abort()
+        reports.put(("error", index, traceback.format_exc()))
+    finally:
+        del migrants, fitness
+
+
+class IslandOptimizer:
+    """岛屿模型遗传算法：K个子种群在独立进程中演化，每隔M代交换最优的m个个体
+
+    每个岛屿有自己的仿真器与核缓存，FFT使用单线程，评估吞吐随核心数近似线性增长；
+    子种群之间的隔离保持了种群多样性，缓解单一种群的早熟收敛。迁移在所有岛屿之间
+    同步进行，固定随机种子时结果可复现。进度字典的格式与MaskOptimizer.iterate相同，
+    停止条件在主进程中按所有岛屿的最优适应度判断。
+    """
+
+    def __init__(self, simulator, target_image, islands=None, seed=None):
+        self.simulator = simulator
+        self.target_image = target_image
+        params = simulator.params
+        self.islands = int(islands or default_island_count(params))
+        self.migration_size = min(int(params.get("migration_size", DEFAULT_MIGRATION_SIZE)),
+                                  params.get("population_size", 50))
+        self.seed = seed if seed is not None else params.get("seed")
+
+    def island_parameters(self):
+        # 岛屿进程各自单线程FFT，金字塔与进程池在岛屿内部不启用；
+        # FFT后端在主进程中确定，避免每个岛屿重复测速
+        return dict(self.simulator.params, fft_workers=1, workers=0, pyramid_levels=1,
+                    fft_backend=self.simulator.get_fft().name)
+
+    def iterate(self, initial_mask):
+        """逐代产出所有岛屿汇总后的进度，格式同MaskOptimizer.iterate"""
+        params = self.island_parameters()
+        Lx, Ly = self.simulator.get_grid_shape()
+        ngen = params.get("generations", 20)
+        initial_mask = np.clip(np.asarray(initial_mask, dtype=np.float32), 0, 1)
+        target = np.asarray(self.target_image, dtype=np.float32)
+        # 未固定种子时也要保证各岛的随机序列互不相同
+        base_seed = self.seed if self.seed is not None else int(np.random.SeedSequence().generate_state(1)[0])
+
+        migrants_shape = (self.islands, self.migration_size, Lx * Ly)
+        shared = (shared_memory.SharedMemory(create=True, size=int(np.prod(migrants_shape)) * 4),
+                  shared_memory.SharedMemory(create=True, size=self.islands * self.migration_size * 8))
+        context = process_context()
+        barrier = context.Barrier(self.islands)
+        reports = context.Queue()
+        stop_event = context.Event()
+        processes = [context.Process(
+            target=_run_island, daemon=True,
+            args=(index, params, initial_mask, target, base_seed + index, shared, migrants_shape,
+                  barrier, reports, stop_event))
+            for index in range(self.islands)]
+
+        stopping = StoppingCriteria.from_params(params)
+        log = tools.Logbook()
+        log.header = ["gen", "nevals", "avg", "min", "max", "hits", "misses"]
+        best_fitness = [float("inf")] * self.islands
+        best_masks = [None] * self.islands
+        pending = {}
+
+        print(f"岛屿模型: {self.islands} 个岛屿, 每 {params.get('migration_interval', DEFAULT_MIGRATION_INTERVAL)} "
+              f"代迁移 {self.migration_size} 个个体")
+        try:
+            for process in processes:
+                process.start()
+
+            for gen in range(ngen + 1):
+                with self.simulator.profiler.span("island.generation"):
+                    records = self._collect_generation(gen, pending, reports, processes,
+                                                       best_fitness, best_masks)
+
+                nevals = sum(record["nevals"] for record in records)
+                # 与MaskOptimizer一致，评估预算只计实际执行的仿真（各岛累计的缓存未命中数）
+                stopping.evaluations = sum(record["misses"] for record in records)
+                # 各岛子种群规模相同，整体平均值即各岛平均值的均值
+                log.record(gen=gen, nevals=nevals,
+                           avg=float(np.mean([record["avg"] for record in records])),
+                           min=float(np.min([record["min"] for record in records])),
+                           max=float(np.max([record["max"] for record in records])),
+                           hits=sum(record["hits"] for record in records),
+                           misses=sum(record["misses"] for record in records))
+                print(log.stream)
+
+                island = int(np.argmin(best_fitness))
+                reason = stopping.check(best_fitness[island])
+                if reason is None and gen == ngen:
+                    reason = STOP_MAX_GENERATIONS
+                log.stop_reason = reason
+
+                best_mask = np.clip(np.frombuffer(best_masks[island], dtype=np.float32).reshape((Lx, Ly)), 0, 1)
+                yield {"generation": gen, "total": ngen, "record": log[-1],
+                       "best_mask": best_mask, "log": log, "stop_reason": reason}
+                if reason is not None:
+                    print(f"优化停止: {reason}（第 {gen} 代）")
+                    break
+        finally:
+            self._shutdown(processes, barrier, reports, stop_event)
+            for memory in shared:
+                memory.close()
+                memory.unlink()
+
+    def _collect_generation(self, gen, pending, reports, processes, best_fitness, best_masks):
+        """等待所有岛屿完成第gen代，返回各岛的统计记录"""
+        while len(pending.get(gen, ())) < self.islands:
+            try:
+                message = reports.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                dead = [index for index, process in enumerate(processes) if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"岛屿进程 {dead} 异常退出")
+                continue
+            if message[0] == "error":
+                raise RuntimeError(f"岛屿 {message[1]} 运行出错:\n{message[2]}")
+
+            _, index, island_gen, record, best, best_mask = message
+            if best_mask is not None and best < best_fitness[index]:
+                best_fitness[index] = best
+                best_masks[index] = best_mask
+            pending.setdefault(island_gen, []).append(record)
+        return pending.pop(gen)
+
+    @staticmethod
+    def _shutdown(processes, barrier, reports, stop_event):
+        """通知岛屿进程结束；等待期间持续取走队列中的消息，避免进程阻塞在写队列上"""
+        stop_event.set()
+        barrier.abort()
+        for process in processes:
+            while process.is_alive():
+                process.join(timeout=0.1)
+                try:
+                    while True:
+                        reports.get_nowait()
+                except queue.Empty:
+                    pass
+        reports.close()
+
+    def optimize(self, initial_mask, progress_callback=None):
+        progress = None
+        for progress in self.iterate(initial_mask):
+            if progress_callback is not None:
+                progress_callback(progress)
+        return progress["best_mask"], progress["log"]
@@ -1,10 +1,177 @@
+import threading
+from collections import OrderedDict
+
 import numpy as np
-from scipy.fft import fft2, ifft2, fftshift, ifftshift
+from scipy.fft import ifftshift, next_fast_len
+
+from .fft_backend import DEFAULT_FFT_BACKEND, DEFAULT_FFT_WORKERS, get_fft_backend
+from .resist_model import DEFAULT_RESIST_THRESHOLD
+from utils.profiling import null_profiler
+
+# 决定光学核的参数（另加FFT网格形状），掩膜以外的仿真结果只依赖于这些参数
+KERNEL_PARAMETER_KEYS = ("wavelength", "distance", "pixel_size",
+                         "refractive_index", "sigma", "numerical_aperture")
+
+# 成像模式："scalar"为原有的一维TCC近似，"socs"为二维Hopkins TCC的相干系统叠加分解
+DEFAULT_IMAGING_MODE = "scalar"
+DEFAULT_SOCS_KERNELS = 8        # 保留的相干核数量k，越大越精确、越慢
+DEFAULT_SOURCE_SAMPLES = 9      # 光源在每个方向上的采样点数
+
+# 计算精度：float64为默认的双精度，float32可减少约一半的内存带宽
+PRECISION_DTYPES = {
+    "float64": (np.float64, np.complex128),
+    "float32": (np.float32, np.complex64),
+}
+DEFAULT_PRECISION = "float64"
+
+# 半频谱分量中反厄米部分相对幅度低于该值时视为零，省去一次逆变换
+ANTI_HERMITIAN_TOLERANCE = 1e-12
+
+# 稀疏频谱更新使用的DFT矩阵，按(长度, 列数, 复数类型)缓存，各仿真器共享
+_dft_matrices = {}
+_dft_lock = threading.Lock()
+
+
+def get_grid_shape(params):
+    """仿真网格形状(Lx, Ly)：给出image_shape时按其行列数，否则为image_size见方"""
+    shape = params.get("image_shape")
+    if shape is None:
+        return params["image_size"], params["image_size"]
+    return int(shape[0]), int(shape[1])
+
+
+def get_fft_shape(params):
+    """实际做FFT的网格形状：fft_padding开启时各维补零到next_fast_len，避免素数等慢速尺寸
+
+    成像核按FFT网格采样频率，补零会改变核的采样与周期边界，仿真结果随之改变，
+    因此默认关闭，只作为以结果变化换取速度的选项。
+    """
+    Lx, Ly = get_grid_shape(params)
+    if not params.get("fft_padding", False):
+        return Lx, Ly
+    real = params.get("real_fft", True)
+    return next_fast_len(Lx, real=real), next_fast_len(Ly, real=real)
+
+
+def dft_matrix(length, columns, dtype):
+    """一维DFT矩阵的前columns列：W[x, u] = exp(-2πi·x·u/length)，只读"""
+    key = (length, columns, np.dtype(dtype).str)
+    with _dft_lock:
+        matrix = _dft_matrices.get(key)
+        if matrix is None:
+            # 先对整数乘积取模再换算相位，避免大尺寸时相位的舍入误差
+            phase = np.outer(np.arange(length), np.arange(columns)) % length
+            matrix = np.exp(-2j * np.pi * phase / length).astype(dtype)
+            matrix.flags.writeable = False
+            _dft_matrices[key] = matrix
+        return matrix
+
+
+def _reverse_frequencies(kernel):
+    """返回K[-k]（按fft2频率排列，在最后两维上取负频率）"""
+    return np.roll(np.flip(kernel, axis=(-2, -1)), 1, axis=(-2, -1))
+
+
+class ImagingKernels:
+    """缓存的成像核：完整频谱核、权重以及实数输入快速路径所需的半频谱分量
+
+    实数掩膜的频谱F满足厄米对称。将核拆为 K = Kh + 1j * Kb，其中
+    Kh = (K + conj(K[-k])) / 2 与 Kb = (K - conj(K[-k])) / 2j 均为厄米核，
+    则 ifft2(F * K) = irfft2(F * Kh) + 1j * irfft2(F * Kb)，两项都是实数，
+    只需半频谱即可计算。
+    """
+
+    def __init__(self, kernels, weights):
+        self.kernels = kernels
+        self.weights = weights
+        self._half_spectrum = {}
+        self._full_spectrum = {}
+
+    def full(self, dtype):
+        """完整频谱核，按指定复数精度转换"""
+        kernels = self._full_spectrum.get(dtype)
+        if kernels is None:
+            kernels = self.kernels.astype(dtype)
+            kernels.flags.writeable = False
+            self._full_spectrum[dtype] = kernels
+        return kernels
+
+    def half(self, dtype):
+        """半频谱形式的(厄米分量, 反厄米分量)，后者可忽略时为None"""
+        components = self._half_spectrum.get(dtype)
+        if components is None:
+            reversed_conj = np.conj(_reverse_frequencies(self.kernels))
+            half = self.kernels.shape[-1] // 2 + 1
+            hermitian = ((self.kernels + reversed_conj) / 2)[..., :half].astype(dtype)
+            anti = ((self.kernels - reversed_conj) / 2j)[..., :half].astype(dtype)
+            scale = np.max(np.abs(self.kernels))
+            if scale == 0 or np.max(np.abs(anti)) <= ANTI_HERMITIAN_TOLERANCE * scale:
+                anti = None
+            else:
+                anti.flags.writeable = False
+            hermitian.flags.writeable = False
+            components = (hermitian, anti)
+            self._half_spectrum[dtype] = components
+        return components
+
+
+class OpticalKernelCache:
+    """按光学参数缓存频域滤波核，超出容量时按LRU淘汰"""
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # 多个会话的仿真可能在不同线程中同时访问缓存
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(params):
+        key = tuple(float(params[name]) for name in KERNEL_PARAMETER_KEYS) + get_fft_shape(params)
+        mode = params.get("imaging_mode", DEFAULT_IMAGING_MODE)
+        if mode == "socs":
+            key += (mode, int(params.get("socs_kernels", DEFAULT_SOCS_KERNELS)),
+                    int(params.get("source_samples", DEFAULT_SOURCE_SAMPLES)))
+        return key
+
+    def get(self, key):
+        with self._lock:
+            kernel = self._entries.get(key)
+            if kernel is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return kernel
+
+    def put(self, key, kernel):
+        with self._lock:
+            self._entries[key] = kernel
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# 进程内共享的默认缓存，同一参数下的多个仿真器复用同一份核
+default_kernel_cache = OpticalKernelCache()
 
 
 class LithographySimulator:
-    def __init__(self, parameters):
+    def __init__(self, parameters, kernel_cache=None, profiler=None):
         self.params = parameters
+        self.kernel_cache = kernel_cache if kernel_cache is not None else default_kernel_cache
+        # 耗时区间记录器，默认不记录
+        self.profiler = profiler if profiler is not None else null_profiler
 
     def transfer_function(self, fx, fy):
         lambda_ = self.params["wavelength"]
@@ -36,42 +203,238 @@ class LithographySimulator:
         tcc = np.convolve(J * P, J * P, mode='same')
         return tcc
 
-    def simulate(self, mask):
-        Lx = Ly = self.params["image_size"]
+    def build_kernel(self):
+        """构建频域滤波核（TCC与传递函数之积），已换算为fft2输出的频率排列"""
+        _, Ly = get_fft_shape(self.params)
+        dx = dy = self.params["pixel_size"]
+
+        # 计算空间频率坐标（标量模型的核只随最后一维变化，按最后一维的长度采样）
+        fx = np.linspace(-0.5 / dx, 0.5 / dx, Ly)
+        fy = np.linspace(-0.5 / dy, 0.5 / dy, Ly)
+
+        # TCC与传递函数都只随最后一维变化，合并后预先做ifftshift，
+        # 仿真时即可省去对频谱的fftshift/ifftshift
+        kernel = self.compute_tcc(fx, fy) * self.transfer_function(fx, fy)
+        return ifftshift(kernel)
+
+    def build_socs_kernels(self):
+        """构建二维Hopkins TCC并分解为前k个相干核（SOCS），返回(核, 权重)
+
+        TCC = sum_s J_s * P(f + f_s) P*(f' + f_s)，其中P含传递函数。
+        记A的每一列为sqrt(J_s) * P(f + f_s)，则TCC = A A^H，
+        对A做SVD即可得到TCC的特征分解而无需显式构造TCC矩阵。
+        """
+        Lx, Ly = get_fft_shape(self.params)
         dx = dy = self.params["pixel_size"]
+        sigma = self.params["sigma"]
+        NA = self.params["numerical_aperture"]
+        lambda_ = self.params["wavelength"]
+        num_kernels = int(self.params.get("socs_kernels", DEFAULT_SOCS_KERNELS))
+        num_samples = int(self.params.get("source_samples", DEFAULT_SOURCE_SAMPLES))
 
-        # 计算空间频率坐标
+        # 二维空间频率坐标
         fx = np.linspace(-0.5 / dx, 0.5 / dx, Lx)
         fy = np.linspace(-0.5 / dy, 0.5 / dy, Ly)
+        FX, FY = np.meshgrid(fx, fy, indexing="ij")
+
+        # 在光源圆盘内采样点光源
+        radius = sigma * NA / lambda_
+        samples = np.linspace(-radius, radius, num_samples)
+        SX, SY = np.meshgrid(samples, samples, indexing="ij")
+        SX, SY = SX.ravel(), SY.ravel()
+        weights = self.light_source_function(SX, SY)
+        inside = weights > 0
+        if not np.any(inside):
+            # 光源小于采样间隔时退化为相干照明
+            SX, SY, weights = np.zeros(1), np.zeros(1), np.ones(1)
+        else:
+            SX, SY, weights = SX[inside], SY[inside], weights[inside]
+        weights = weights / np.sum(weights)
+
+        # 每个点光源对应一个平移后的光瞳函数
+        A = np.empty((Lx * Ly, len(weights)), dtype=np.complex128)
+        for s, (sx, sy, w) in enumerate(zip(SX, SY, weights)):
+            pupil = (self.impulse_response_function(FX + sx, FY + sy)
+                     * self.transfer_function(FX + sx, FY + sy))
+            A[:, s] = np.sqrt(w) * pupil.ravel()
 
-        # 计算TCC
-        tcc = self.compute_tcc(fx, fy)
+        U, S, _ = np.linalg.svd(A, full_matrices=False)
+        k = max(1, min(num_kernels, len(S)))
+        kernels = U[:, :k].T.reshape((k, Lx, Ly))
 
-        # 频域转换和滤波
-        M_fft = fftshift(fft2(mask))
-        filtered_fft = M_fft * tcc
+        return ifftshift(kernels, axes=(-2, -1)), S[:k] ** 2
 
-        # 应用传递函数
-        H = self.transfer_function(fx, fy)
-        result_fft = filtered_fft * H
+    def get_kernel(self):
+        """从缓存获取当前参数对应的成像核(ImagingKernels)
 
-        # 逆变换回空间域
-        result = ifft2(ifftshift(result_fft))
+        标量模式下权重为None，成像结果取场的幅度；
+        SOCS模式下成像结果为各相干核强度的加权和。
+        """
+        key = self.kernel_cache.make_key(self.params)
+        entry = self.kernel_cache.get(key)
+        if entry is None:
+            with self.profiler.span("kernel.build"):
+                if self.params.get("imaging_mode", DEFAULT_IMAGING_MODE) == "socs":
+                    kernels, weights = self.build_socs_kernels()
+                else:
+                    kernels, weights = self.build_kernel()[np.newaxis, np.newaxis], None
+            # 缓存的核被多次复用，禁止原地修改
+            kernels.flags.writeable = False
+            entry = ImagingKernels(kernels, weights)
+            self.kernel_cache.put(key, entry)
+        return entry
 
-        # 获取幅度并清理数据
-        result_abs = np.abs(result)
+    def get_fft(self):
+        """按参数中的fft_backend/fft_workers获取FFT后端（"auto"时按图像尺寸自动选择）"""
+        return get_fft_backend(self.params.get("fft_backend", DEFAULT_FFT_BACKEND),
+                               self.params.get("fft_workers", DEFAULT_FFT_WORKERS),
+                               shape=get_fft_shape(self.params), real=self.params.get("real_fft", True),
+                               dtype=self.get_dtypes()[0])
 
-        # 清理数据：处理NaN和无穷大
-        result_abs = np.nan_to_num(result_abs, nan=0.0, posinf=np.max(result_abs), neginf=0.0)
+    def get_grid_shape(self):
+        return get_grid_shape(self.params)
+
+    def get_fft_shape(self):
+        return get_fft_shape(self.params)
+
+    def pad_to_fft(self, masks):
+        """在右下方补零到FFT网格形状，尺寸已满足时原样返回"""
+        Lx, Ly = masks.shape[-2:]
+        Px, Py = self.get_fft_shape()
+        if (Px, Py) == (Lx, Ly):
+            return masks
+        padding = [(0, 0)] * (masks.ndim - 2) + [(0, Px - Lx), (0, Py - Ly)]
+        return np.pad(masks, padding)
+
+    def get_dtypes(self):
+        """返回当前精度下的(实数类型, 复数类型)"""
+        return PRECISION_DTYPES[self.params.get("precision", DEFAULT_PRECISION)]
+
+    def simulate(self, mask):
+        return self.simulate_batch(np.asarray(mask)[np.newaxis])[0]
+
+    def simulate_batch(self, masks, normalize=True):
+        """批量仿真，masks形状为(N, Lx, Ly)，在最后两维上做堆叠FFT"""
+        spectrum = self.forward_spectrum(masks)
+        return self.image_from_spectrum(spectrum, np.shape(masks)[-2:], overwrite_spectrum=True,
+                                        normalize=normalize)
+
+    def forward_spectrum(self, masks):
+        """掩膜的正变换频谱（real_fft时为半频谱），只依赖掩膜与精度，可在不同光学核间复用"""
+        real_dtype, _ = self.get_dtypes()
+        masks = self.pad_to_fft(np.asarray(masks, dtype=real_dtype))
+        fft = self.get_fft()
+        with self.profiler.span("fft.forward"):
+            if self.params.get("real_fft", True):
+                return fft.rfft2(masks)
+            return fft.fft2(masks)
+
+    def update_spectrum(self, spectrum, rows, cols, deltas):
+        """在已有频谱上叠加少量像素的变化，返回新频谱（与forward_spectrum的格式相同）
+
+        像素(x, y)变化d时频谱增加d·exp(-2πi(u·x/Px + v·y/Py))，是两个一维相位斜坡的外积，
+        k个像素的更新合起来即(Px, k)与(k, Py)两个矩阵之积，计算量约为k·Px·Py，
+        只有变化像素很少时才比完整FFT快。
+        """
+        _, complex_dtype = self.get_dtypes()
+        Px, Py = self.get_fft_shape()
+        with self.profiler.span("fft.incremental"):
+            ramp_x = dft_matrix(Px, Px, complex_dtype)[:, rows] * deltas
+            ramp_y = dft_matrix(Py, spectrum.shape[-1], complex_dtype)[cols]
+            return spectrum + ramp_x @ ramp_y
+
+    def image_from_spectrum(self, spectrum, shape, overwrite_spectrum=False, normalize=True):
+        """由forward_spectrum的结果按当前光学核成像并归一化
+
+        shape为输出图像（补零前的网格）形状；overwrite_spectrum为False时不修改输入频谱，
+        便于参数扫描中复用；normalize为False时返回未归一化的强度（分块仿真需在拼接后统一归一化）。
+        """
+        real_dtype, complex_dtype = self.get_dtypes()
+        entry = self.get_kernel()
+        fft = self.get_fft()
+        Lx, Ly = shape
+        fft_shape = self.get_fft_shape()
+
+        # 频域滤波与逆变换
+        with self.profiler.span("fft.imaging"):
+            if self.params.get("real_fft", True):
+                result_abs = self._image_real_input(spectrum, fft_shape, entry, fft, complex_dtype,
+                                                    real_dtype, overwrite_spectrum)
+            else:
+                result_abs = self._image_complex(spectrum, entry, fft, complex_dtype,
+                                                 real_dtype, overwrite_spectrum)
+        if fft_shape != (Lx, Ly):
+            # 裁掉补零区域
+            result_abs = np.ascontiguousarray(result_abs[..., :Lx, :Ly])
+
+        # 清理数据：处理NaN和无穷大（逐图像取最大值）
+        peak = np.max(result_abs, axis=(-2, -1), keepdims=True)
+        if not np.all(np.isfinite(result_abs)):
+            finite_peak = np.max(np.where(np.isfinite(result_abs), result_abs, 0),
+                                 axis=(-2, -1), keepdims=True)
+            result_abs = np.where(np.isposinf(result_abs), finite_peak, result_abs)
+            np.nan_to_num(result_abs, copy=False, nan=0.0, neginf=0.0)
+            peak = np.max(result_abs, axis=(-2, -1), keepdims=True)
 
         # 归一化到0-1范围
-        if np.max(result_abs) > 0:
-            result_abs = result_abs / np.max(result_abs)
+        if normalize:
+            np.divide(result_abs, peak, out=result_abs, where=peak > 0)
 
         return result_abs
 
+    def _image_complex(self, spectrum, entry, fft, complex_dtype, real_dtype, overwrite_spectrum):
+        """完整复数频谱成像"""
+        kernels = entry.full(complex_dtype)
+
+        if entry.weights is None:
+            # 频域滤波并逆变换回空间域，获取幅度
+            if overwrite_spectrum:
+                filtered = np.multiply(spectrum, kernels[0], out=spectrum)
+            else:
+                filtered = spectrum * kernels[0]
+            return np.abs(fft.ifft2(filtered))
+
+        # 逐个相干核成像并累加强度，内存占用与核数量无关
+        result = np.zeros(spectrum.shape, dtype=real_dtype)
+        for kernel, weight in zip(kernels, entry.weights):
+            field = fft.ifft2(spectrum * kernel)
+            intensity = np.square(field.real)
+            intensity += np.square(field.imag)
+            intensity *= weight
+            result += intensity
+        return result
+
+    def _image_real_input(self, spectrum, shape, entry, fft, complex_dtype, real_dtype, overwrite_spectrum):
+        """实数输入快速路径：半频谱正变换，按厄米/反厄米分量各做一次实数逆变换"""
+        hermitian, anti = entry.half(complex_dtype)
+
+        if entry.weights is None:
+            imag_part = None if anti is None else fft.irfft2(spectrum * anti[0], s=shape)
+            if overwrite_spectrum:
+                filtered = np.multiply(spectrum, hermitian[0], out=spectrum)
+            else:
+                filtered = spectrum * hermitian[0]
+            result = fft.irfft2(filtered, s=shape)
+            if imag_part is None:
+                return np.abs(result, out=result)
+            return np.hypot(result, imag_part, out=result)
+
+        result = np.zeros(spectrum.shape[:-2] + shape, dtype=real_dtype)
+        for k, weight in enumerate(entry.weights):
+            real_part = fft.irfft2(spectrum * hermitian[k], s=shape)
+            np.square(real_part, out=real_part)
+            if anti is not None:
+                imag_part = fft.irfft2(spectrum * anti[k], s=shape)
+                np.square(imag_part, out=imag_part)
+                real_part += imag_part
+            real_part *= weight
+            result += real_part
+        return result
+
     def binarize_image(self, image, threshold=None):
-        """二值化图像"""
-        if threshold is None:
-            threshold = 0.5 * np.max(image)
-        return (image > threshold).astype(np.uint8)
\ No newline at end of file
+        """二值化图像，输入为(N, Lx, Ly)时按每幅图像各自的最大值乘以光刻胶阈值resist_threshold取阈值"""
+        with self.profiler.span("binarize"):
+            if threshold is None:
+                relative = self.params.get("resist_threshold", DEFAULT_RESIST_THRESHOLD)
+                threshold = relative * np.max(image, axis=(-2, -1), keepdims=True)
+            return (image > threshold).astype(np.uint8)
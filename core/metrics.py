@@ -0,0 +1,182 @@
+import numpy as np
+from scipy import ndimage
+
+from .resist_model import DEFAULT_RESIST_THRESHOLD, ResistModel, print_binary
+
+# 计算图像对数斜率时强度的下限，避免除零
+ILS_INTENSITY_FLOOR = 1e-6
+
+
+def _as_batch(images):
+    """返回(N, Lx, Ly)形式的数组以及输入是否为单幅图像"""
+    images = np.asarray(images)
+    if images.ndim == 2:
+        return images[np.newaxis], True
+    return images, False
+
+
+def _result(values, single):
+    return float(values[0]) if single else values
+
+
+def pattern_edges(binary):
+    """图形的内边界：自身为1且四邻域中有0的像素，binary为(..., Lx, Ly)布尔数组"""
+    interior = binary.copy()
+    interior[..., 1:, :] &= binary[..., :-1, :]
+    interior[..., :-1, :] &= binary[..., 1:, :]
+    interior[..., :, 1:] &= binary[..., :, :-1]
+    interior[..., :, :-1] &= binary[..., :, 1:]
+    # binary & ~interior，原地写回interior
+    return np.greater(binary, interior, out=interior)
+
+
+def contrast(images):
+    """Michelson对比度 (max - min) / (max + min)，逐图像计算"""
+    images, single = _as_batch(images)
+    peak = np.max(images, axis=(-2, -1)).astype(np.float64)
+    trough = np.min(images, axis=(-2, -1)).astype(np.float64)
+    total = peak + trough
+    values = np.divide(peak - trough, total, out=np.zeros_like(total), where=total > 0)
+    return _result(values, single)
+
+
+class PatternMetrics:
+    """以目标图像为基准的评价指标：图形误差(PE)、边缘放置误差(EPE)与图像对数斜率(ILS)
+
+    与目标有关的量在构造时计算一次。输入可以是单幅图像(Lx, Ly)或(N, Lx, Ly)批量，
+    可以是空间像（按光刻胶模型的相对阈值二值化）也可以是已二值化的图像；单幅输入返回标量，
+    批量返回数组；threshold未给出时使用光刻胶模型的阈值。
+    对二值图像b与取值在[0, 1]的目标t，|b - t| = t + b·(1 - 2t)，因此
+    PE = Σt + Σ_{b=1}(1 - 2t)：只需一个布尔临时数组和一次布尔图像与权重的缩并（einsum），
+    不再为二值图像、类型转换与差值分配整幅的浮点临时数组。
+    """
+
+    def __init__(self, target, epe_weight=0.0, ils_weight=0.0, resist=None, smooth=False):
+        target = np.asarray(target, dtype=np.float32)
+        self.target = target
+        self.shape = target.shape
+        self.pixels = target.size
+        self.epe_weight = epe_weight
+        self.ils_weight = ils_weight
+        self.resist = resist if resist is not None else ResistModel()
+        # smooth为True时适应度的图形误差项用sigmoid显影轮廓计算
+        self.smooth = smooth
+
+        self.target_sum = float(np.sum(target, dtype=np.float64))
+        self.weights = 1.0 - 2.0 * target.astype(np.float64)
+
+        # 目标图形的边缘像素及各像素到最近目标边缘的距离（像素）
+        self.target_edges = pattern_edges(target > DEFAULT_RESIST_THRESHOLD)
+        self.edge_index = np.flatnonzero(self.target_edges)
+        if len(self.edge_index):
+            self.edge_distance = ndimage.distance_transform_edt(~self.target_edges)
+        else:
+            self.edge_distance = np.full(self.shape, np.hypot(*self.shape))
+        # 没有任何边缘被印出时EPE取网格对角线长度
+        self.missing_edge_distance = float(np.hypot(*self.shape))
+        self._setup_edge_gradient()
+
+    def _setup_edge_gradient(self):
+        """目标边缘像素上下左右邻居的展平下标与差分步长（边界处为单侧差分）"""
+        Lx, Ly = self.shape
+        rows, cols = np.divmod(self.edge_index, Ly)
+        up, down = np.maximum(rows - 1, 0), np.minimum(rows + 1, Lx - 1)
+        left, right = np.maximum(cols - 1, 0), np.minimum(cols + 1, Ly - 1)
+        self._gradient_x = (down * Ly + cols, up * Ly + cols, np.maximum(down - up, 1))
+        self._gradient_y = (rows * Ly + right, rows * Ly + left, np.maximum(right - left, 1))
+
+    @classmethod
+    def from_params(cls, target, params):
+        """按params中的fitness_epe_weight/fitness_ils_weight、光刻胶参数与smooth_fitness构造"""
+        return cls(target, epe_weight=params.get("fitness_epe_weight", 0.0),
+                   ils_weight=params.get("fitness_ils_weight", 0.0),
+                   resist=ResistModel.from_params(params),
+                   smooth=params.get("smooth_fitness", False))
+
+    def pattern_error(self, images, threshold=None, normalize=False):
+        """图形误差Σ|b - t|；normalize为True时除以像素数（即平均图形误差）"""
+        images, single = _as_batch(images)
+        values = self._pattern_error(self._binary(images, threshold))
+        if normalize:
+            values /= self.pixels
+        return _result(values, single)
+
+    def _binary(self, images, threshold):
+        return print_binary(images, self.resist.threshold if threshold is None else threshold)
+
+    def _pattern_error(self, binary):
+        return self.target_sum + np.einsum("nij,ij->n", binary, self.weights)
+
+    def edge_placement_error(self, images, threshold=None):
+        """印出图形的边缘像素到最近目标边缘的平均距离（像素）"""
+        images, single = _as_batch(images)
+        return _result(self._edge_placement_error(self._binary(images, threshold)), single)
+
+    def _edge_placement_error(self, binary):
+        edges = pattern_edges(binary)
+        counts = np.count_nonzero(edges, axis=(-2, -1))
+        totals = np.einsum("nij,ij->n", edges, self.edge_distance)
+        return np.divide(totals, counts, out=np.full(len(counts), self.missing_edge_distance),
+                         where=counts > 0)
+
+    def image_log_slope(self, images):
+        """目标边缘处的平均图像对数斜率|∇I| / I（1/像素），越大表示边缘越陡、工艺宽容度越好
+
+        只在目标边缘像素上按中心差分取梯度（边界处为单侧差分），不计算整幅梯度图。
+        """
+        images, single = _as_batch(images)
+        if not len(self.edge_index):
+            return _result(np.zeros(len(images)), single)
+
+        flat = images.reshape((len(images), -1))
+        forward, backward, step = self._gradient_x
+        grad_x = (flat[:, forward] - flat[:, backward]) / step
+        forward, backward, step = self._gradient_y
+        grad_y = (flat[:, forward] - flat[:, backward]) / step
+        intensity = np.maximum(flat[:, self.edge_index], ILS_INTENSITY_FLOOR)
+        return _result(np.mean(np.hypot(grad_x, grad_y) / intensity, axis=-1), single)
+
+    def ils_penalty(self, images):
+        """由图像对数斜率构造的惩罚项1 / (1 + ILS)，取值(0, 1]，边缘越陡越小"""
+        images, single = _as_batch(images)
+        return _result(1.0 / (1.0 + self.image_log_slope(images)), single)
+
+    def smooth_pattern_error(self, images):
+        """sigmoid显影轮廓Z与目标的平均绝对误差mean|Z - t|，陡度趋于无穷时即平均图形误差"""
+        images, single = _as_batch(images)
+        resist = self.resist.develop(images)
+        resist -= self.target
+        return _result(np.mean(np.abs(resist, out=resist), axis=(-2, -1)), single)
+
+    def fitness(self, images, threshold=None):
+        """优化的适应度（越小越好）：平均图形误差（smooth时为sigmoid显影下的误差），
+        加上按权重计入的EPE与ILS惩罚"""
+        images, single = _as_batch(images)
+        if self.smooth:
+            values = self.smooth_pattern_error(images)
+        else:
+            values = self._pattern_error(self._binary(images, threshold)) / self.pixels
+        if self.epe_weight:
+            values += self.epe_weight * self._edge_placement_error(self._binary(images, threshold))
+        if self.ils_weight:
+            values += self.ils_weight / (1.0 + self.image_log_slope(images))
+        return _result(values, single)
+
+    def evaluate(self, images, threshold=None):
+        """一次给出全部指标：{"pe", "epe", "ils", "contrast"}"""
+        images, single = _as_batch(images)
+        binary = self._binary(images, threshold)
+        metrics = {
+            "pe": self._pattern_error(binary),
+            "epe": self._edge_placement_error(binary),
+            "ils": self.image_log_slope(images) if images.dtype != np.bool_ else np.zeros(len(images)),
+            "contrast": contrast(images),
+        }
+        if single:
+            return {name: float(values[0]) for name, values in metrics.items()}
+        return metrics
+
+
+def pattern_error(image, target, threshold=DEFAULT_RESIST_THRESHOLD):
+    """图像（空间像或二值图像）与目标图像的图形误差（PE）"""
+    return PatternMetrics(target).pattern_error(image, threshold)
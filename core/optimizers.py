@@ -0,0 +1,35 @@
+from .genetic_algorithm import MaskOptimizer
+from .inverse_lithography import GradientMaskOptimizer
+from .island_model import IslandOptimizer, default_island_count
+
+# 可选的掩膜优化引擎：遗传算法与基于梯度的逆光刻
+OPTIMIZER_ENGINES = {
+    "ga": "遗传算法",
+    "island": "遗传算法 (岛屿模型)",
+    "adam": "梯度优化 (Adam)",
+    "lbfgs": "梯度优化 (L-BFGS)",
+}
+DEFAULT_OPTIMIZER_ENGINE = "ga"
+
+
+def job_processes(params):
+    """一次任务同时占用的进程数：岛屿模型为岛屿数，进程池评估为进程数，其余为1"""
+    engine = params.get("optimizer_engine", DEFAULT_OPTIMIZER_ENGINE)
+    if engine == "island":
+        return default_island_count(params)
+    workers = params.get("workers") or 0
+    if engine == "ga" and workers > 1:
+        return workers
+    return 1
+
+
+def create_optimizer(simulator, target_image, engine=None):
+    """按引擎名称创建优化器，未指定时读取params中的optimizer_engine"""
+    engine = engine or simulator.params.get("optimizer_engine", DEFAULT_OPTIMIZER_ENGINE)
+    if engine == "ga":
+        return MaskOptimizer(simulator, target_image)
+    if engine == "island":
+        return IslandOptimizer(simulator, target_image)
+    if engine in ("adam", "lbfgs"):
+        return GradientMaskOptimizer(simulator, target_image, method=engine)
+    raise ValueError(f"未知的优化引擎: {engine}")
@@ -0,0 +1,129 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+
+from .lithography_simulation import LithographySimulator, OpticalKernelCache, get_grid_shape
+from .metrics import PatternMetrics, contrast
+from .resist_model import DEFAULT_RESIST_THRESHOLD
+from utils.image_processing import load_and_preprocess_image
+
+# 扫描中改变这些参数会改变掩膜频谱本身，无法复用同一次正变换
+FIXED_SWEEP_KEYS = ("image_size", "image_shape", "fft_padding", "precision", "real_fft",
+                    "fft_backend", "fft_workers")
+# 二值化阈值（相对于每幅图像的最大强度），不影响光学核，相当于曝光剂量；
+# 未扫描时取该点（或基础参数）中的resist_threshold
+THRESHOLD_KEY = "threshold"
+# 光刻胶模型参数，不影响光学核，按扫描点分别构造评价指标
+RESIST_KEYS = ("resist_threshold", "resist_steepness")
+
+
+def grid_points(ranges):
+    """网格扫描点：ranges为{参数名: 取值序列}，返回所有组合的参数字典列表"""
+    names = list(ranges)
+    return [dict(zip(names, values)) for values in itertools.product(*(ranges[name] for name in names))]
+
+
+def latin_hypercube_points(bounds, n_points, seed=None):
+    """拉丁超立方扫描点：bounds为{参数名: (下限, 上限)}，整数边界的参数取整"""
+    names = list(bounds)
+    lower = [bounds[name][0] for name in names]
+    upper = [bounds[name][1] for name in names]
+    samples = qmc.scale(qmc.LatinHypercube(d=len(names), seed=seed).random(n_points), lower, upper)
+
+    points = []
+    for row in samples:
+        point = {}
+        for name, value in zip(names, row):
+            low, high = bounds[name]
+            integer = isinstance(low, (int, np.integer)) and isinstance(high, (int, np.integer))
+            point[name] = int(round(value)) if integer else float(value)
+        points.append(point)
+    return points
+
+
+class ParameterSweep:
+    """光刻仿真参数扫描（工艺窗口分析）
+
+    固定一组掩膜，只做一次批量正变换；扫描点按光学核分组，每组构建一次核并对
+    全部掩膜批量成像，组内仅二值化阈值不同的点共用同一幅空间像。
+    """
+
+    def __init__(self, base_parameters, masks, targets=None, kernel_cache=None):
+        self.base_parameters = dict(base_parameters)
+        grid_shape = get_grid_shape(self.base_parameters)
+
+        self.masks = np.stack([load_and_preprocess_image(mask, grid_shape) for mask in masks])
+        if targets is None:
+            # 未给目标时以掩膜本身作为设计图形
+            self.targets = self.masks
+        else:
+            self.targets = np.stack([load_and_preprocess_image(target, grid_shape) for target in targets])
+            if len(self.targets) != len(self.masks):
+                raise ValueError("掩膜与目标图像数量不一致")
+        # 按光刻胶参数缓存各目标的评价指标，扫描光刻胶参数时每组取值只构造一次
+        self._metrics = {}
+        self.metrics = self.metrics_for(self.base_parameters)
+
+        # 每组核只使用一次，使用独立的小缓存以免挤掉界面会话的常用核
+        self.kernel_cache = kernel_cache or OpticalKernelCache(max_entries=1)
+
+    def metrics_for(self, parameters):
+        """与parameters中的光刻胶参数对应的各目标评价指标"""
+        key = tuple(parameters.get(name) for name in RESIST_KEYS)
+        metrics = self._metrics.get(key)
+        if metrics is None:
+            metrics = [PatternMetrics.from_params(target, parameters) for target in self.targets]
+            self._metrics[key] = metrics
+        return metrics
+
+    def run(self, points):
+        """逐点评估，返回每个(扫描点, 掩膜)一行的DataFrame，包含PE与对比度"""
+        for point in points:
+            fixed = [name for name in point if name in FIXED_SWEEP_KEYS]
+            if fixed:
+                raise ValueError(f"参数扫描不支持改变: {', '.join(fixed)}")
+
+        base_simulator = LithographySimulator(self.base_parameters, self.kernel_cache)
+        spectrum = base_simulator.forward_spectrum(self.masks)
+        shape = self.masks.shape[-2:]
+
+        # 按光学核分组
+        groups = {}
+        for index, point in enumerate(points):
+            parameters = {**self.base_parameters, **point}
+            parameters.pop(THRESHOLD_KEY, None)
+            key = self.kernel_cache.make_key(parameters)
+            groups.setdefault(key, (parameters, []))[1].append(index)
+
+        rows = []
+        for parameters, indices in groups.values():
+            simulator = LithographySimulator(parameters, self.kernel_cache)
+            images = simulator.image_from_spectrum(spectrum, shape)
+
+            image_contrast = contrast(images)
+
+            for index in indices:
+                point = points[index]
+                # 组内各点只共用光学参数，光刻胶参数取该点自身的值
+                point_parameters = {**self.base_parameters, **point}
+                threshold = point.get(THRESHOLD_KEY, point_parameters.get("resist_threshold", DEFAULT_RESIST_THRESHOLD))
+                for mask_index, metrics in enumerate(self.metrics_for(point_parameters)):
+                    rows.append({"point": index, **point, "mask": mask_index,
+                                 "pe": metrics.pattern_error(images[mask_index], threshold),
+                                 "contrast": float(image_contrast[mask_index])})
+
+        return pd.DataFrame(rows).sort_values(["point", "mask"]).reset_index(drop=True)
+
+
+def run_sweep(base_parameters, masks, ranges=None, bounds=None, n_points=None,
+              method="grid", targets=None, seed=None):
+    """参数扫描的便捷入口：method为"grid"时使用ranges，为"lhs"时使用bounds与n_points"""
+    if method == "grid":
+        points = grid_points(ranges)
+    elif method == "lhs":
+        points = latin_hypercube_points(bounds, n_points, seed)
+    else:
+        raise ValueError(f"未知的扫描方式: {method}")
+    return ParameterSweep(base_parameters, masks, targets).run(points)
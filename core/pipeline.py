@@ -0,0 +1,80 @@
+from .lithography_simulation import LithographySimulator, get_grid_shape
+from .metrics import PatternMetrics
+from .optimizers import create_optimizer
+from utils.image_processing import fit_grid_shape, load_and_preprocess_image
+from utils.profiling import Profiler, null_profiler
+
+
+class LithographyJob:
+    """一次完整的掩膜优化流程：加载 → 初始仿真 → 优化 → 优化后仿真 → PE
+
+    不依赖界面，可由Gradio应用、批处理命令行或其他Python代码直接调用。
+    params["profile"]为真时各阶段耗时记录在self.profiler中。
+    """
+
+    def __init__(self, mask_image, target_image, parameters):
+        self.profiler = Profiler() if parameters.get("profile") else null_profiler
+        if parameters.get("image_shape") is None and parameters.get("preserve_aspect_ratio"):
+            # 按目标图像的宽高比确定网格，image_size作为长边
+            parameters = dict(parameters, image_shape=fit_grid_shape(target_image, parameters["image_size"]))
+        self.parameters = parameters
+        grid_shape = get_grid_shape(parameters)
+
+        # 加载和预处理图像（文件路径或数组均可）
+        with self.profiler.span("image.load"):
+            self.mask = load_and_preprocess_image(mask_image, grid_shape)
+            self.target = load_and_preprocess_image(target_image, grid_shape)
+        # 与仿真的二值化使用同一光刻胶模型（resist_threshold）
+        self.metrics = PatternMetrics.from_params(self.target, parameters)
+
+        self.simulator = LithographySimulator(parameters, profiler=self.profiler)
+
+        # 初始掩膜仿真
+        with self.profiler.span("simulate.initial"):
+            self.initial_simulation = self.simulator.simulate(self.mask)
+            self.initial_binary = self.simulator.binarize_image(self.initial_simulation)
+            self.initial_pe = self.metrics.pattern_error(self.initial_binary)
+
+    def iterate(self):
+        """逐代产出优化进度（格式同MaskOptimizer.iterate）"""
+        optimizer = create_optimizer(self.simulator, self.target)
+        yield from optimizer.iterate(self.mask)
+
+    def results(self, best_mask, log):
+        """用给定掩膜做优化后仿真，返回与StateManager.update_results兼容的结果字典"""
+        with self.profiler.span("simulate.optimized"):
+            optimized_simulation = self.simulator.simulate(best_mask)
+            optimized_binary = self.simulator.binarize_image(optimized_simulation)
+
+        return {
+            "original": self.target,  # 原始图像
+            "initial": {
+                "mask": self.mask,
+                "simulation": self.initial_simulation,
+                "binary": self.initial_binary,
+                "pe": self.initial_pe
+            },
+            "optimized": {
+                "mask": best_mask,
+                "simulation": optimized_simulation,
+                "binary": optimized_binary,
+                "pe": self.metrics.pattern_error(optimized_binary)
+            },
+            "target": self.target,
+            "parameters": self.parameters,
+            "log": log,
+            "profile": self.profiler
+        }
+
+
+def run_job(mask_image, target_image, parameters, progress_callback=None):
+    """无界面地执行一次掩膜优化并返回结果字典
+
+    progress_callback(progress)在每代结束时调用，progress格式同MaskOptimizer.iterate。
+    """
+    job = LithographyJob(mask_image, target_image, parameters)
+    progress = None
+    for progress in job.iterate():
+        if progress_callback is not None:
+            progress_callback(progress)
+    return job.results(progress["best_mask"], progress["log"])
@@ -0,0 +1,97 @@
+import numpy as np
+
+# 光刻胶模型 Z = sigmoid(steepness * (I / max(I) - threshold))，阈值相对于每幅图像的最大强度
+DEFAULT_RESIST_THRESHOLD = 0.5
+DEFAULT_RESIST_STEEPNESS = 30.0
+
+
+def sigmoid(x):
+    # 用tanh表示，避免大幅值时exp溢出
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def print_binary(images, threshold=DEFAULT_RESIST_THRESHOLD):
+    """按每幅图像最大强度的threshold倍二值化，返回布尔数组；已是布尔数组时原样返回"""
+    if images.dtype == np.bool_:
+        return images
+    peak = np.max(images, axis=(-2, -1), keepdims=True)
+    return images > threshold * peak
+
+
+class ResistModel:
+    """光刻胶模型：硬阈值显影与sigmoid松弛显影
+
+    硬阈值模型给出实际印出的二值图形；sigmoid模型是其光滑近似，steepness越大越接近硬阈值，
+    用作适应度时误差随空间像连续变化，不再是分段常数，优化器在平台区也能分辨个体优劣。
+    输入为单幅(Lx, Ly)或(N, Lx, Ly)批量空间像，逐图像按各自的最大强度归一化。
+    """
+
+    def __init__(self, threshold=DEFAULT_RESIST_THRESHOLD, steepness=DEFAULT_RESIST_STEEPNESS):
+        self.threshold = threshold
+        self.steepness = steepness
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(threshold=params.get("resist_threshold", DEFAULT_RESIST_THRESHOLD),
+                   steepness=params.get("resist_steepness", DEFAULT_RESIST_STEEPNESS))
+
+    def binarize(self, images):
+        """硬阈值显影，返回布尔数组"""
+        return print_binary(np.asarray(images), self.threshold)
+
+    def develop_normalized(self, normalized):
+        """对已归一化（最大值为1）的空间像做sigmoid显影"""
+        return sigmoid(self.steepness * (normalized - self.threshold))
+
+    def develop(self, images):
+        """sigmoid显影，返回取值(0, 1)的光刻胶轮廓，形状与输入相同"""
+        images = np.asarray(images, dtype=np.float64)
+        peak = np.max(images, axis=(-2, -1), keepdims=True)
+        normalized = np.divide(images, peak, out=np.zeros_like(images), where=peak > 0)
+        normalized -= self.threshold
+        normalized *= self.steepness
+        return sigmoid(normalized)
+
+    def derivative(self, resist):
+        """显影轮廓对归一化强度的导数 dZ/dI = steepness · Z · (1 - Z)"""
+        return self.steepness * resist * (1 - resist)
+
+    def calibrate(self, images, targets):
+        """返回按calibrate_threshold拟合阈值后的新模型，陡度不变"""
+        return ResistModel(calibrate_threshold(images, targets), self.steepness)
+
+
+def calibrate_threshold(images, targets):
+    """拟合使一组空间像的总图形误差最小的相对阈值
+
+    images与targets为(N, Lx, Ly)或单幅图像。阈值th下像素印出当且仅当I / max(I) > th，
+    PE(th) = Σt + Σ_{I/max > th}(1 - 2t)。把全部像素按归一化强度降序排列，
+    对权重(1 - 2t)做累加即可一次得到所有候选阈值下的PE，取最小者；
+    返回该位置与下一个强度之间的中点，计算量为一次排序。
+    """
+    images = np.asarray(images, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+    if images.shape != targets.shape:
+        raise ValueError("空间像与目标图像的形状不一致")
+    if images.ndim == 2:
+        images, targets = images[np.newaxis], targets[np.newaxis]
+
+    peak = np.max(images, axis=(-2, -1), keepdims=True)
+    normalized = np.divide(images, peak, out=np.zeros_like(images), where=peak > 0).ravel()
+    weights = 1.0 - 2.0 * targets.ravel()
+
+    order = np.argsort(normalized)[::-1]
+    levels = normalized[order]
+    # errors[k]为强度最高的k个像素印出时的PE（未加常数Σt）；k=0表示全部不印出
+    errors = np.concatenate(([0.0], np.cumsum(weights[order])))
+    # 强度相同的像素必须同时印出或不印出，只在强度变化处取候选
+    candidates = np.concatenate(([0], np.flatnonzero(np.diff(levels) < 0) + 1, [len(levels)]))
+    best = candidates[np.argmin(errors[candidates])]
+
+    upper = levels[best - 1] if best > 0 else 1.0
+    if best < len(levels):
+        lower = levels[best]
+    else:
+        # 全部印出时阈值必须严格低于最低强度；最低强度为0时只能取负值
+        lower = 0.0 if levels[-1] > 0 else levels[-1] - 1.0
+    return float((upper + lower) / 2)
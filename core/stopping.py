@@ -0,0 +1,69 @@
+import time
+
+# 停止原因
+STOP_TARGET_REACHED = "达到目标误差"
+STOP_PLATEAU = "连续{patience}代无改进"
+STOP_TIME_BUDGET = "超出时间预算"
+STOP_EVALUATION_BUDGET = "超出仿真评估次数预算"
+STOP_MAX_GENERATIONS = "达到最大迭代次数"
+
+
+class StoppingCriteria:
+    """优化的提前停止条件
+
+    target_pe: 最优适应度不高于该值时停止
+    patience: 最优适应度连续patience代改进不超过min_delta时停止
+    time_budget: 运行时间预算（秒）
+    max_evaluations: 实际执行仿真的次数上限
+    未设置（None）的条件不生效。时间与评估次数预算在多分辨率各层之间累计。
+    """
+
+    def __init__(self, target_pe=None, patience=None, time_budget=None,
+                 max_evaluations=None, min_delta=0.0):
+        self.target_pe = target_pe
+        self.patience = patience
+        self.time_budget = time_budget
+        self.max_evaluations = max_evaluations
+        self.min_delta = min_delta
+
+        self.start_time = time.perf_counter()
+        self.evaluations = 0
+        self.reset_plateau()
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(target_pe=params.get("target_pe"),
+                   patience=params.get("patience"),
+                   time_budget=params.get("time_budget"),
+                   max_evaluations=params.get("max_evaluations"),
+                   min_delta=params.get("min_delta", 0.0))
+
+    def reset_plateau(self):
+        """重新开始无改进计数（如进入金字塔的下一层）"""
+        self.best = float("inf")
+        self.stale_generations = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def budget_exhausted(self):
+        """返回已耗尽的全局预算对应的停止原因，否则返回None"""
+        if self.time_budget is not None and self.elapsed() >= self.time_budget:
+            return STOP_TIME_BUDGET
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return STOP_EVALUATION_BUDGET
+        return None
+
+    def check(self, best_fitness):
+        """每代结束时调用，返回停止原因，未满足任何条件时返回None"""
+        if best_fitness < self.best - self.min_delta:
+            self.best = best_fitness
+            self.stale_generations = 0
+        else:
+            self.stale_generations += 1
+
+        if self.target_pe is not None and best_fitness <= self.target_pe:
+            return STOP_TARGET_REACHED
+        if self.patience is not None and self.stale_generations >= self.patience:
+            return STOP_PLATEAU.format(patience=self.patience)
+        return self.budget_exhausted()
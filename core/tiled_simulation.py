@@ -0,0 +1,201 @@
+"""全版图分块仿真
+
+用法:
+    python -m core.tiled_simulation layout.npy aerial.npy --tile-size 512 --workers 8
+
+将大尺寸版图切成带重叠边缘（halo）的窗口逐块仿真，裁掉边缘后拼接到内存映射的
+输出文件中。halo按光学核在空间域的支撑半径确定，窗口之间的循环卷积误差因此被
+限制在边缘内；各工作进程只持有一个窗口的数据，峰值内存与版图尺寸无关。
+"""
+import argparse
+import math
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import yaml
+
+from .lithography_simulation import LithographySimulator
+from .resist_model import DEFAULT_RESIST_THRESHOLD
+from utils.layout_io import create_layout, open_layout, to_unit_range
+
+DEFAULT_TILE_SIZE = 256
+# halo内需包含的点扩散函数能量比例
+HALO_ENERGY = 0.999
+# 归一化、二值化等逐行处理时每次读取的行数
+ROW_CHUNK = 1024
+
+_worker = {}
+
+
+def kernel_halo(simulator, energy=HALO_ENERGY):
+    """光学核在空间域的支撑半径（像素）：点扩散函数能量的energy比例落在该半径内"""
+    Lx, Ly = simulator.get_fft_shape()
+    entry = simulator.get_kernel()
+    kernels = np.broadcast_to(entry.kernels, entry.kernels.shape[:1] + (Lx, Ly))
+    weights = np.ones(1) if entry.weights is None else entry.weights
+
+    # 各相干核点扩散函数的加权能量分布，原点位于[0, 0]
+    psf = np.fft.ifft2(kernels)
+    power = np.tensordot(weights, np.abs(psf) ** 2, axes=1)
+
+    # 按循环距离（考虑周期延拓）由近到远累计能量
+    x = np.minimum(np.arange(Lx), Lx - np.arange(Lx))
+    y = np.minimum(np.arange(Ly), Ly - np.arange(Ly))
+    distance = np.hypot(x[:, None], y[None, :]).ravel()
+    order = np.argsort(distance, kind="stable")
+    cumulative = np.cumsum(power.ravel()[order])
+    if cumulative[-1] <= 0:
+        return 0
+    index = np.searchsorted(cumulative, energy * cumulative[-1])
+    return int(math.ceil(distance[order][min(index, len(order) - 1)]))
+
+
+def tile_origins(shape, core):
+    """各分块有效区域（不含halo）的左上角坐标"""
+    return [(row, col) for row in range(0, shape[0], core) for col in range(0, shape[1], core)]
+
+
+def read_window(layout, row, col, size, halo):
+    """读取以(row, col)为有效区域起点、含halo的窗口，超出版图的部分补零"""
+    window = np.zeros((size, size), dtype=np.float32)
+    top, left = row - halo, col - halo
+    r0, c0 = max(top, 0), max(left, 0)
+    r1, c1 = min(top + size, layout.shape[0]), min(left + size, layout.shape[1])
+    if r1 > r0 and c1 > c0:
+        window[r0 - top:r1 - top, c0 - left:c1 - left] = to_unit_range(np.asarray(layout[r0:r1, c0:c1]))
+    return window
+
+
+def simulate_tile(simulator, layout, output, row, col, halo):
+    """仿真一个分块并把裁掉halo后的有效区域写入output，返回该块的最大强度"""
+    size = simulator.params["image_size"]
+    core = size - 2 * halo
+    window = read_window(layout, row, col, size, halo)
+    image = simulator.simulate_batch(window[np.newaxis], normalize=False)[0]
+
+    rows = min(core, output.shape[0] - row)
+    cols = min(core, output.shape[1] - col)
+    block = image[halo:halo + rows, halo:halo + cols]
+    output[row:row + rows, col:col + cols] = block
+    return float(np.max(block)) if block.size else 0.0
+
+
+def _init_worker(parameters, layout_path, layout_shape, layout_dtype, output_path, halo):
+    """工作进程初始化：各自打开内存映射的输入输出文件并构建仿真器"""
+    _worker["simulator"] = LithographySimulator(dict(parameters, fft_workers=1))
+    _worker["layout"] = open_layout(layout_path, layout_shape, layout_dtype)
+    _worker["output"] = np.load(output_path, mmap_mode="r+")
+    _worker["halo"] = halo
+
+
+def _simulate_tile_in_worker(origin):
+    peak = simulate_tile(_worker["simulator"], _worker["layout"], _worker["output"],
+                         origin[0], origin[1], _worker["halo"])
+    _worker["output"].flush()
+    return peak
+
+
+def simulate_layout(layout_path, output_path, parameters, tile_size=DEFAULT_TILE_SIZE,
+                    workers=None, normalize=True, binary_path=None, layout_shape=None,
+                    layout_dtype=None, progress_callback=None):
+    """分块仿真整幅版图，空间像写入output_path（.npy），返回(halo, 全局最大强度)
+
+    normalize时按全版图的最大强度归一化（而非逐块归一化）；给出binary_path时
+    额外按resist_threshold（默认0.5）倍最大强度写出二值化结果（uint8）。
+    progress_callback(done, total)在每个分块完成后调用。
+    """
+    layout = open_layout(layout_path, layout_shape, layout_dtype)
+    parameters = dict(parameters, image_size=int(tile_size), image_shape=None)
+    simulator = LithographySimulator(parameters)
+    # "auto"只在主进程中选择一次，工作进程直接使用选出的后端
+    parameters["fft_backend"] = simulator.get_fft().name
+
+    halo = kernel_halo(simulator)
+    core = tile_size - 2 * halo
+    if core <= 0:
+        raise ValueError(f"分块尺寸 {tile_size} 过小，光学核支撑半径为 {halo} 像素")
+    if core < tile_size // 4:
+        print(f"警告: 光学核支撑半径（{halo} 像素）接近分块尺寸，大部分计算浪费在halo上，建议增大分块尺寸")
+
+    output = create_layout(output_path, layout.shape, np.float32)
+    origins = tile_origins(layout.shape, core)
+    workers = workers or os.cpu_count() or 1
+
+    peak = 0.0
+    if workers > 1 and len(origins) > 1:
+        output.flush()
+        initargs = (parameters, layout_path, layout_shape, layout_dtype, output_path, halo)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            # 限制同时提交的分块数，避免一次性为所有分块创建任务
+            pending, remaining, done = set(), iter(origins), 0
+            while True:
+                for origin in remaining:
+                    pending.add(executor.submit(_simulate_tile_in_worker, origin))
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    peak = max(peak, future.result())
+                    done += 1
+                    if progress_callback is not None:
+                        progress_callback(done, len(origins))
+        # 重新映射以读取工作进程写入的数据
+        output = np.load(output_path, mmap_mode="r+")
+    else:
+        for done, (row, col) in enumerate(origins, start=1):
+            peak = max(peak, simulate_tile(simulator, layout, output, row, col, halo))
+            if progress_callback is not None:
+                progress_callback(done, len(origins))
+
+    binary = create_layout(binary_path, layout.shape, np.uint8) if binary_path else None
+    relative = parameters.get("resist_threshold", DEFAULT_RESIST_THRESHOLD)
+    if (normalize and peak > 0) or binary is not None:
+        for start in range(0, layout.shape[0], ROW_CHUNK):
+            rows = slice(start, start + ROW_CHUNK)
+            if normalize and peak > 0:
+                output[rows] /= peak
+            if binary is not None:
+                threshold = relative if normalize and peak > 0 else relative * peak
+                binary[rows] = output[rows] > threshold
+        if binary is not None:
+            binary.flush()
+    output.flush()
+    return halo, peak
+
+
+def main(argv=None):
+    from gradio_app.config.lithography_config import DEFAULT_PARAMETERS, SIMULATION_OPTIONS
+
+    parser = argparse.ArgumentParser(description="大尺寸版图分块光刻仿真")
+    parser.add_argument("layout", help="输入版图（.npy / .raw / .tif）")
+    parser.add_argument("output", help="输出空间像（.npy）")
+    parser.add_argument("--binary", default=None, help="输出二值化结果（.npy）")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE, help="分块窗口尺寸（含halo）")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="并行进程数，默认为CPU核心数")
+    parser.add_argument("--shape", type=int, nargs=2, default=None, help="raw版图的行数与列数")
+    parser.add_argument("--dtype", default=None, help="raw版图的数据类型，如uint8")
+    parser.add_argument("--params", default=None, help="覆盖默认光学参数的YAML/JSON文件")
+    args = parser.parse_args(argv)
+
+    parameters = {**DEFAULT_PARAMETERS, **SIMULATION_OPTIONS}
+    if args.params:
+        with open(args.params, "r", encoding="utf-8") as f:
+            parameters.update(yaml.safe_load(f) or {})
+
+    def report(done, total):
+        if done == total or done % max(1, total // 20) == 0:
+            print(f"分块仿真进度: {done}/{total}")
+
+    halo, peak = simulate_layout(args.layout, args.output, parameters, args.tile_size, args.workers,
+                                 binary_path=args.binary, layout_shape=args.shape,
+                                 layout_dtype=args.dtype, progress_callback=report)
+    print(f"完成：halo为 {halo} 像素，最大强度 {peak:.6g}，结果保存在 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,33 +17,63 @@ from gradio_app.layouts.input_panel import create_input_panel
 from gradio_app.layouts.output_panel import create_output_panel
 from gradio_app.layouts.footer import create_footer
 from gradio_app.components.state_manager import StateManager
+from gradio_app.components.job_queue import JobQueue
 from gradio_app.config.theme_config import load_theme
-from gradio_app.config.lithography_config import DEFAULT_PARAMETERS
+from gradio_app.config.lithography_config import (DEFAULT_PARAMETERS, SIMULATION_OPTIONS, QUEUE_OPTIONS,
+                                                  RESULT_STORE_OPTIONS)
 
-from core.lithography_simulation import LithographySimulator
-from core.genetic_algorithm import MaskOptimizer
-from utils.image_processing import load_and_preprocess_image
+from core.optimizers import job_processes
+from core.pipeline import LithographyJob
+from core.fft_backend import autotune_fft_backend
+from core.lithography_simulation import DEFAULT_PRECISION, PRECISION_DTYPES, get_fft_shape, get_grid_shape
+from utils.image_processing import fit_grid_shape, load_and_preprocess_image
+from utils.parameter_validation import validate_parameters
+from utils.result_store import ResultStore
+
+# 优化过程中向界面推送中间结果的最小时间间隔（秒）
+STREAM_INTERVAL = 0.5
 
 
 class LithographyApp:
-    def __init__(self):
-        self.state_manager = StateManager()
-        self.simulator = None
-        self.current_results = {}
+    """应用入口；仿真器与结果均按会话隔离，应用本身只持有共享的任务队列"""
+
+    def __init__(self, max_concurrent_jobs=QUEUE_OPTIONS["max_concurrent_jobs"],
+                 max_waiting_jobs=QUEUE_OPTIONS["max_waiting_jobs"]):
+        self.job_queue = JobQueue(max_concurrent_jobs, max_waiting_jobs)
+        self.result_store = ResultStore(RESULT_STORE_OPTIONS["directory"], RESULT_STORE_OPTIONS["max_bytes"])
 
     def initialize_simulation(self, parameters):
-        """初始化光刻仿真器"""
-        self.simulator = LithographySimulator(parameters)
+        """初始化光刻仿真系统（预先选出FFT后端）"""
+        parameters = {**SIMULATION_OPTIONS, **parameters}
+
+        # 启动时针对配置的图像尺寸选出最快的FFT后端
+        if parameters.get("fft_backend") == "auto":
+            real_dtype, _ = PRECISION_DTYPES[parameters.get("precision", DEFAULT_PRECISION)]
+            backend = autotune_fft_backend(get_fft_shape(parameters), self._fft_workers_per_job(),
+                                           real=parameters.get("real_fft", True), dtype=real_dtype)
+            return f"仿真系统初始化完成（FFT后端: {backend}）"
         return "仿真系统初始化完成"
 
-    def run_simulation(self, mask_image, target_image, wavelength, distance, pixel_size,
+    def _fft_workers_per_job(self):
+        """每个任务的FFT线程数：CPU核心按最大并发任务数平分，同时运行的任务线程总数不超过核心数"""
+        return max(1, self.job_queue.cores // self.job_queue.max_concurrent)
+
+    def run_simulation(self, session, mask_image, target_image, wavelength, distance, pixel_size,
                        image_size, refractive_index, sigma, numerical_aperture,
                        population_size, generations, crossover_rate, mutation_rate,
-                       progress=gr.Progress()):
-        """执行光刻仿真和优化"""
+                       optimizer_engine, progress=gr.Progress()):
+        """执行光刻仿真和优化（生成器，排队等待后逐代推送中间结果）
+
+        session为该用户会话的StateManager（gr.State），每次运行使用独立的仿真器，
+        不同会话之间互不影响。
+        """
+        no_change = (gr.update(),) * 9
+
         try:
-            # 构建参数字典
-            parameters = {
+            # 界面输入的转换与校验出错时同样在状态栏显示错误
+            parameters = validate_parameters({
+                **SIMULATION_OPTIONS,
+                "fft_workers": self._fft_workers_per_job(),
                 "wavelength": float(wavelength),
                 "distance": float(distance),
                 "pixel_size": float(pixel_size),
@@ -53,77 +83,115 @@ class LithographyApp:
                 "numerical_aperture": float(numerical_aperture),
                 "population_size": int(population_size),
                 "generations": int(generations),
+                # 梯度优化（adam/lbfgs）的迭代次数同样取自界面的迭代次数，与批处理的--generations一致
+                "ilt_iterations": int(generations),
                 "crossover_rate": float(crossover_rate),
-                "mutation_rate": float(mutation_rate)
-            }
-
-            # 加载和预处理图像
-            mask_array = load_and_preprocess_image(mask_image, parameters["image_size"])
-            target_array = load_and_preprocess_image(target_image, parameters["image_size"])
-
-            # 初始化仿真器
-            if self.simulator is None:
-                self.initialize_simulation(parameters)
-            else:
-                self.simulator.params = parameters
+                "mutation_rate": float(mutation_rate),
+                "optimizer_engine": optimizer_engine
+            })
+            if parameters.get("preserve_aspect_ratio"):
+                # 按目标图像的宽高比确定网格，图像尺寸作为长边
+                parameters["image_shape"] = fit_grid_shape(target_image, parameters["image_size"])
+            grid_shape = get_grid_shape(parameters)
+            mask_array = load_and_preprocess_image(mask_image, grid_shape)
+            target_array = load_and_preprocess_image(target_image, grid_shape)
+        except Exception as e:
+            yield (None,) * 6 + (gr.DataFrame(), None, gr.DataFrame(), f"仿真过程中出错: {str(e)}", session)
+            return
+        # 相同的任务直接从结果库取回，无需排队
+        key = self.result_store.make_key(mask_array, target_array, parameters)
+        cached = self.result_store.get(key)
+        if cached is not None:
+            session.update_results(cached)
+            yield self._generate_outputs(session) + ("已从结果库载入相同任务的结果", session)
+            return
+
+        # 排队等待运行名额
+        ticket = self.job_queue.enqueue()
+        if ticket is None:
+            yield no_change + ("任务队列已满，请稍后再试", session)
+            return
+        # 单进程任务预留其FFT线程数个核心，岛屿模型等多进程任务按进程数预留
+        processes = job_processes(parameters)
+        cores = processes if processes > 1 else parameters["fft_workers"]
+        try:
+            while not self.job_queue.wait_turn(ticket, cores, timeout=1.0):
+                position = self.job_queue.position(ticket)
+                wait = self.job_queue.estimated_wait(position)
+                yield no_change + (f"排队中：第 {position} 位，预计等待约 {wait:.0f} 秒", session)
+        except GeneratorExit:
+            self.job_queue.cancel(ticket)
+            raise
+
+        start_time = time.time()
+        try:
+            yield from self._run_job(session, mask_array, target_array, parameters, key, progress)
+        finally:
+            self.job_queue.finish(time.time() - start_time, cores)
 
+    def _run_job(self, session, mask_image, target_image, parameters, key, progress):
+        try:
             progress(0.1, desc="正在执行初始仿真...")
 
-            # 初始掩膜仿真
-            initial_simulation = self.simulator.simulate(mask_array)
-            initial_binary = self.simulator.binarize_image(initial_simulation)
-
-            # 计算初始PE
-            initial_pe = np.sum(np.abs(initial_binary.astype(np.float32) - target_array.astype(np.float32)))
+            # 每次运行使用独立的仿真流程（光学核缓存在进程内共享）
+            job = LithographyJob(mask_image, target_image, parameters)
 
             progress(0.3, desc="正在优化掩膜...")
 
-            # 使用遗传算法优化掩膜
-            optimizer = MaskOptimizer(self.simulator, target_array)
-            best_mask, log = optimizer.optimize(mask_array)  # 现在返回log而不是stats
+            # 使用所选引擎（遗传算法或梯度逆光刻）优化掩膜，逐代推送中间结果
+            last_stream = 0.0
+            for update in job.iterate():
+                generation, total = update["generation"], max(update["total"], 1)
+                progress(0.3 + 0.5 * min(generation / total, 1.0),
+                         desc=f"正在优化掩膜... 第 {generation}/{total} 代")
 
-            progress(0.8, desc="正在执行优化后仿真...")
+                # 按时间间隔节流，避免每代都重绘界面
+                now = time.time()
+                if now - last_stream >= STREAM_INTERVAL:
+                    last_stream = now
+                    session.update_results(job.results(update["best_mask"], update["log"]))
+                    yield self._generate_outputs(session) + (f"优化中：第 {generation}/{total} 代", session)
 
-            # 优化后仿真
-            optimized_simulation = self.simulator.simulate(best_mask)
-            optimized_binary = self.simulator.binarize_image(optimized_simulation)
-            optimized_pe = np.sum(np.abs(optimized_binary.astype(np.float32) - target_array.astype(np.float32)))
-
-            # 保存结果 - 包含所有六个图像和优化日志
-            self.current_results = {
-                "original": target_array,  # 原始图像
-                "initial": {
-                    "mask": mask_array,
-                    "simulation": initial_simulation,
-                    "binary": initial_binary,
-                    "pe": initial_pe
-                },
-                "optimized": {
-                    "mask": best_mask,
-                    "simulation": optimized_simulation,
-                    "binary": optimized_binary,
-                    "pe": optimized_pe
-                },
-                "target": target_array,
-                "log": log  # 保存优化日志而不是stats
-            }
-
-            # 更新状态管理器
-            self.state_manager.update_results(self.current_results)
+            progress(0.8, desc="正在执行优化后仿真...")
+            results = job.results(update["best_mask"], update["log"])
+            session.update_results(results)
+            self.result_store.put(key, results, parameters)
 
             progress(1.0, desc="完成！")
 
-            return self._generate_outputs()
+            yield self._generate_outputs(session) + ("仿真优化完成", session)
 
         except Exception as e:
             error_msg = f"仿真过程中出错: {str(e)}"
             print(error_msg)
             # 返回空结果
-            return None, None, None, None, None, None, gr.DataFrame(), None
-
-    def _generate_outputs(self):
+            yield (None,) * 6 + (gr.DataFrame(), None, gr.DataFrame(), error_msg, session)
+
+    def list_history(self):
+        """历史记录表格与可选的记录列表"""
+        rows, choices = [], []
+        for key, created, initial_pe, optimized_pe, stop_reason, parameters in self.result_store.list_runs():
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))
+            engine = parameters.get("optimizer_engine", "ga")
+            rows.append([created, engine, parameters.get("image_size"), f"{initial_pe:.4f}",
+                         f"{optimized_pe:.4f}", stop_reason or "N/A", key[:12]])
+            choices.append((f"{created} | {engine} | PE {optimized_pe:.2f} | {key[:12]}", key))
+        history = pd.DataFrame(rows, columns=["时间", "优化引擎", "图像尺寸", "初始PE", "优化PE", "停止原因", "结果键"])
+        return history, gr.update(choices=choices, value=None)
+
+    def load_history(self, session, key):
+        """将历史记录载入到当前会话的输出面板"""
+        if not key:
+            return (gr.update(),) * 9 + ("请先选择一条历史记录", session)
+        results = self.result_store.get(key)
+        if results is None:
+            return (gr.update(),) * 9 + ("该历史记录已被清理", session)
+        session.update_results(results)
+        return self._generate_outputs(session) + (f"已载入历史记录 {key[:12]}", session)
+
+    def _generate_outputs(self, session):
         """生成输出结果"""
-        if not self.current_results:
+        if not session.current_results:
             # 返回默认的空值 - 使用更小的图像尺寸
             empty_image = np.ones((200, 200)) * 255
             empty_pil = Image.fromarray(empty_image.astype(np.uint8))
@@ -147,9 +215,10 @@ class LithographyApp:
                 height=400
             )
 
-            return empty_pil, empty_pil, empty_pil, empty_pil, empty_pil, empty_pil, empty_df, fig
+            return (empty_pil, empty_pil, empty_pil, empty_pil, empty_pil, empty_pil, empty_df, fig,
+                    session.generate_performance_table())
 
-        results = self.current_results
+        results = session.current_results
 
         try:
             # 安全地转换图像数据
@@ -161,10 +230,11 @@ class LithographyApp:
                 # 转换为0-255范围
                 return (data * 255).astype(np.uint8)
 
-            # 获取图像尺寸参数
-            image_size = self.simulator.params.get("image_size", 30)
+            # 获取图像尺寸参数（长边）
+            rows, cols = results["original"].shape[:2]
+            image_size = max(rows, cols)
             # 使用更小的显示尺寸以适应三列布局
-            display_size = max(200, image_size * 8)
+            scale = max(200, image_size * 8) / image_size
 
             # 转换为PIL图像并调整显示尺寸
             def prepare_display_image(data):
@@ -172,7 +242,7 @@ class LithographyApp:
                 img = Image.fromarray(img_array)
                 # 调整到合适的显示尺寸，保持原始比例
                 if image_size < 100:  # 如果原始图像太小，放大显示
-                    new_size = (display_size, display_size)
+                    new_size = (round(cols * scale), round(rows * scale))
                     img = img.resize(new_size, Image.Resampling.NEAREST)
                 return img
 
@@ -185,12 +255,12 @@ class LithographyApp:
             optimized_binary_img = prepare_display_image(results["optimized"]["binary"])
 
             # 生成统计信息
-            stats_df = self.state_manager.generate_stats()
-            evolution_plot = self.state_manager.generate_evolution_plot()
+            stats_df = session.generate_stats()
+            evolution_plot = session.generate_evolution_plot()
 
             return (original_img, initial_exposure_img, initial_binary_img,
                     optimized_mask_img, optimized_exposure_img, optimized_binary_img,
-                    stats_df, evolution_plot)
+                    stats_df, evolution_plot, session.generate_performance_table())
         except Exception as e:
             print(f"生成输出时出错: {e}")
             # 返回错误状态的默认值
@@ -216,7 +286,8 @@ class LithographyApp:
                 height=400
             )
 
-            return error_pil, error_pil, error_pil, error_pil, error_pil, error_pil, error_df, fig
+            return (error_pil, error_pil, error_pil, error_pil, error_pil, error_pil, error_df, fig,
+                    session.generate_performance_table())
 
 
 def run_app():
@@ -230,6 +301,9 @@ def run_app():
             fill_width=True,
             fill_height=True
     ) as demo:
+        # 每个会话独立的状态管理器（保存该用户的仿真结果）
+        session_state = gr.State(StateManager())
+
         create_header()
 
         # 使用全宽布局容器
@@ -240,14 +314,30 @@ def run_app():
 
             # 右侧输出面板
             with gr.Column(scale=9, min_width=600):
-                output_components = create_output_panel(app.state_manager)
+                output_components = create_output_panel(session_state.value)
 
         create_footer()
 
+        # 仿真结果输出（六幅图像、统计表、收敛曲线、耗时统计、状态栏与会话状态）
+        result_outputs = [
+            output_components["original_image"],
+            output_components["initial_exposure"],
+            output_components["initial_binary"],
+            output_components["optimized_mask"],
+            output_components["optimized_exposure"],
+            output_components["optimized_binary"],
+            output_components["stats_display"],
+            output_components["evolution_plot"],
+            output_components["performance_table"],
+            output_components["system_status"],
+            session_state
+        ]
+
         # 绑定仿真按钮事件
-        input_components["simulate_button"].click(
+        simulate_event = input_components["simulate_button"].click(
             fn=app.run_simulation,
             inputs=[
+                session_state,
                 input_components["mask_input"],
                 input_components["target_input"],
                 input_components["wavelength"],
@@ -260,25 +350,45 @@ def run_app():
                 input_components["population_size"],
                 input_components["generations"],
                 input_components["crossover_rate"],
-                input_components["mutation_rate"]
+                input_components["mutation_rate"],
+                input_components["optimizer_engine"]
             ],
-            outputs=[
-                output_components["original_image"],
-                output_components["initial_exposure"],
-                output_components["initial_binary"],
-                output_components["optimized_mask"],
-                output_components["optimized_exposure"],
-                output_components["optimized_binary"],
-                output_components["stats_display"],
-                output_components["evolution_plot"]
-            ]
+            outputs=result_outputs,
+            # 放行的并发数包含排队中的任务，实际运行数由JobQueue控制
+            concurrency_limit=app.job_queue.max_concurrent + app.job_queue.max_waiting
+        )
+
+        history_outputs = [output_components["history_table"], output_components["history_select"]]
+
+        # 仿真完成后刷新历史记录
+        simulate_event.then(fn=app.list_history, outputs=history_outputs)
+
+        # 历史记录：刷新列表与载入到输出面板
+        output_components["history_refresh"].click(fn=app.list_history, outputs=history_outputs)
+        output_components["history_load"].click(
+            fn=app.load_history,
+            inputs=[session_state, output_components["history_select"]],
+            outputs=result_outputs
+        )
+
+        # 导出本会话最近一次运行的Chrome Trace
+        output_components["trace_button"].click(
+            fn=lambda session: session.export_trace(),
+            inputs=[session_state],
+            outputs=[output_components["trace_file"]]
         )
 
+        # 停止按钮取消正在运行的优化，界面保留最后一次推送的结果
+        input_components["stop_button"].click(fn=None, cancels=[simulate_event])
+
         # 初始化仿真系统
         demo.load(
             fn=lambda: app.initialize_simulation(DEFAULT_PARAMETERS),
             outputs=[output_components["system_status"]]
         )
+        demo.load(fn=app.list_history, outputs=history_outputs)
+
+    demo.queue(max_size=app.job_queue.max_concurrent + app.job_queue.max_waiting)
 
     # 启动时设置全屏参数
     demo.launch(
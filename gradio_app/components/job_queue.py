@@ -0,0 +1,85 @@
+import itertools
+import math
+import os
+import threading
+from collections import deque
+
+# 尚无历史记录时用于估算等待时间的单个任务耗时（秒）
+DEFAULT_JOB_DURATION = 30.0
+
+
+class JobQueue:
+    """有界的仿真任务队列：限制同时运行的任务数与占用的CPU核心数，并提供排队位置与预计等待时间
+
+    每个任务开始时按自身的进程数（如岛屿数）预留核心，预留总数不超过cores；
+    没有任务运行时，需要的核心多于cores的任务也可以单独运行。
+    """
+
+    def __init__(self, max_concurrent, max_waiting=32, cores=None):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_waiting = max_waiting
+        self.cores = max(1, int(cores or os.cpu_count() or 1))
+        self._reserved = 0
+        self._condition = threading.Condition()
+        self._tickets = itertools.count()
+        self._waiting = deque()
+        self._running = 0
+        self._durations = deque(maxlen=20)
+
+    def enqueue(self):
+        """登记一个任务并返回票号，队列已满时返回None"""
+        with self._condition:
+            if len(self._waiting) >= self.max_waiting:
+                return None
+            ticket = next(self._tickets)
+            self._waiting.append(ticket)
+            return ticket
+
+    def wait_turn(self, ticket, cores=1, timeout=1.0):
+        """等待轮到该任务，最多阻塞timeout秒；轮到时占用一个运行名额与cores个核心并返回True"""
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: (self._waiting[0] == ticket and self._running < self.max_concurrent
+                         and (self._running == 0 or self._reserved + cores <= self.cores)),
+                timeout=timeout)
+            if ready:
+                self._waiting.popleft()
+                self._running += 1
+                self._reserved += cores
+                self._condition.notify_all()
+            return ready
+
+    def cancel(self, ticket):
+        """放弃尚未开始的任务（如用户关闭页面）"""
+        with self._condition:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+
+    def finish(self, duration, cores=1):
+        """任务结束，释放运行名额与预留的核心并记录耗时"""
+        with self._condition:
+            self._running -= 1
+            self._reserved -= cores
+            self._durations.append(duration)
+            self._condition.notify_all()
+
+    def position(self, ticket):
+        """任务在等待队列中的位置（从1开始），不在队列中时返回0"""
+        with self._condition:
+            try:
+                return self._waiting.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def estimated_wait(self, position):
+        """按近期任务平均耗时估算排在position位的等待时间（秒）"""
+        with self._condition:
+            average = sum(self._durations) / len(self._durations) if self._durations else DEFAULT_JOB_DURATION
+        return math.ceil(position / self.max_concurrent) * average
+
+    def status(self):
+        with self._condition:
+            return {"running": self._running, "waiting": len(self._waiting),
+                    "max_concurrent": self.max_concurrent, "reserved_cores": self._reserved,
+                    "cores": self.cores}
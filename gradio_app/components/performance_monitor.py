@@ -0,0 +1,66 @@
+import os
+import tempfile
+
+import pandas as pd
+
+PERFORMANCE_COLUMNS = ["阶段", "调用次数", "总耗时(ms)", "占运行时间", "p50(ms)", "p95(ms)"]
+
+# 耗时区间名称对应的显示名称
+SPAN_LABELS = {
+    "image.load": "图像加载",
+    "kernel.build": "光学核构建",
+    "fft.forward": "FFT正变换",
+    "fft.imaging": "频域滤波与逆变换",
+    "fft.incremental": "稀疏频谱增量更新",
+    "binarize": "二值化",
+    "simulate.initial": "初始仿真",
+    "simulate.optimized": "优化后仿真",
+    "fitness.population": "整代适应度评估",
+    "fitness.batch": "批量适应度仿真",
+    "fitness.pool": "进程池适应度评估",
+    "fitness.metric": "二值化与误差计算",
+    "ga.select": "遗传算法选择",
+    "ga.variation": "交叉与变异",
+    "island.generation": "岛屿模型每代等待",
+    "ilt.forward": "逆光刻正向成像",
+    "ilt.adjoint": "逆光刻伴随梯度",
+}
+
+
+class PerformanceMonitor:
+    """将一次运行的耗时区间汇总为性能表，并导出Chrome Trace文件"""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def wall_time(self):
+        """从第一个区间开始到最后一个区间结束的时间（秒）"""
+        spans = list(self.profiler.spans)
+        if not spans:
+            return 0.0
+        start = min(span[1] for span in spans)
+        end = max(span[1] + span[2] for span in spans)
+        return end - start
+
+    def generate_table(self):
+        rows = self.profiler.summary()
+        if not rows:
+            return pd.DataFrame(columns=PERFORMANCE_COLUMNS)
+
+        # 区间之间存在嵌套（如整代评估包含FFT），占比按运行总时间计算，各行之和不为100%
+        wall_time = self.wall_time()
+        data = []
+        for name, count, total, _, p50, p95 in rows:
+            share = f"{total / wall_time * 100:.1f}%" if wall_time > 0 else "N/A"
+            data.append([SPAN_LABELS.get(name, name), count, f"{total * 1e3:.2f}", share,
+                         f"{p50 * 1e3:.3f}", f"{p95 * 1e3:.3f}"])
+        return pd.DataFrame(data, columns=PERFORMANCE_COLUMNS)
+
+    def export_chrome_trace(self, directory=None):
+        """写出Chrome Trace JSON并返回文件路径，没有记录时返回None"""
+        if not self.profiler.spans:
+            return None
+        directory = directory or tempfile.gettempdir()
+        fd, path = tempfile.mkstemp(prefix="lithography_trace_", suffix=".json", dir=directory)
+        os.close(fd)
+        return self.profiler.export_chrome_trace(path)
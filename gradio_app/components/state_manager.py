@@ -2,6 +2,9 @@ import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
 
+from core.metrics import PatternMetrics
+from gradio_app.components.performance_monitor import PerformanceMonitor, PERFORMANCE_COLUMNS
+
 
 class StateManager:
     def __init__(self):
@@ -42,22 +45,37 @@ class StateManager:
             initial_pe = self.current_results["initial"]["pe"]
             optimized_pe = self.current_results["optimized"]["pe"]
             improvement = (initial_pe - optimized_pe) / initial_pe * 100 if initial_pe > 0 else 0
+            log = self.current_results.get("log")
+            stop_reason = getattr(log, "stop_reason", None) or "运行中"
+
+            # EPE、ILS与对比度由空间像按与优化相同的指标（含光刻胶阈值）计算
+            metrics = PatternMetrics.from_params(self.current_results["target"],
+                                                 self.current_results.get("parameters", {}))
+            initial = metrics.evaluate(self.current_results["initial"]["simulation"])
+            optimized = metrics.evaluate(self.current_results["optimized"]["simulation"])
 
             stats_data = {
-                "指标": ["图形偏差(PE)", "最大强度", "对比度"],
+                "指标": ["图形偏差(PE)", "边缘放置误差(EPE, 像素)", "图像对数斜率(ILS)", "最大强度", "对比度",
+                       "停止原因"],
                 "初始值": [
                     f"{initial_pe:.4f}",
+                    f"{initial['epe']:.4f}",
+                    f"{initial['ils']:.4f}",
                     f"{np.max(self.current_results['initial']['simulation']):.4f}",
-                    f"{self._calculate_contrast(self.current_results['initial']['binary']):.4f}"
+                    f"{initial['contrast']:.4f}",
+                    "N/A"
                 ],
                 "优化值": [
                     f"{optimized_pe:.4f}",
+                    f"{optimized['epe']:.4f}",
+                    f"{optimized['ils']:.4f}",
                     f"{np.max(self.current_results['optimized']['simulation']):.4f}",
-                    f"{self._calculate_contrast(self.current_results['optimized']['binary']):.4f}"
+                    f"{optimized['contrast']:.4f}",
+                    stop_reason
                 ],
                 "改善率": [
                     f"{improvement:.2f}%" if improvement > 0 else "N/A",
-                    "N/A", "N/A"
+                    "N/A", "N/A", "N/A", "N/A", "N/A"
                 ]
             }
 
@@ -67,6 +85,20 @@ class StateManager:
             return pd.DataFrame([["错误", str(e), "N/A", "N/A"]],
                                 columns=["指标", "初始值", "优化值", "改善率"])
 
+    def generate_performance_table(self):
+        """本次运行各阶段的耗时统计（从结果库载入的结果没有耗时记录）"""
+        profile = self.current_results.get("profile") if self.current_results else None
+        if profile is None:
+            return pd.DataFrame(columns=PERFORMANCE_COLUMNS)
+        return PerformanceMonitor(profile).generate_table()
+
+    def export_trace(self):
+        """导出本次运行的Chrome Trace文件，返回路径，无记录时返回None"""
+        profile = self.current_results.get("profile") if self.current_results else None
+        if profile is None:
+            return None
+        return PerformanceMonitor(profile).export_chrome_trace()
+
     def generate_evolution_plot(self):
         if not self.optimization_history or not self.optimization_history["generations"]:
             fig = go.Figure()
@@ -161,11 +193,3 @@ class StateManager:
                 height=400
             )
             return fig
-
-    def _calculate_contrast(self, image):
-        try:
-            if np.std(image) == 0:
-                return 0
-            return (np.max(image) - np.min(image)) / (np.max(image) + np.min(image))
-        except:
-            return 0
\ No newline at end of file
@@ -1,3 +1,5 @@
+import os
+
 # 光刻系统默认参数配置
 DEFAULT_PARAMETERS = {
     "wavelength": 405,           # 波长 (nm)
@@ -10,5 +12,36 @@ DEFAULT_PARAMETERS = {
     "population_size": 50,       # 遗传算法种群大小
     "generations": 20,           # 遗传算法迭代次数
     "crossover_rate": 0.4,       # 交叉概率
-    "mutation_rate": 0.4         # 变异概率
-}
\ No newline at end of file
+    "mutation_rate": 0.4,        # 变异概率
+    "optimizer_engine": "ga"     # 优化引擎: ga / island / adam / lbfgs
+}
+
+# 仿真计算选项（不在界面中显示）
+SIMULATION_OPTIONS = {
+    "fft_backend": "auto",       # FFT后端: auto / scipy / pyfftw / numpy
+    "fft_workers": -1,           # FFT线程数，-1表示全部CPU核心
+    "precision": "float64",      # 计算精度: float64 / float32
+    "real_fft": True,            # 实数掩膜使用半频谱变换
+    "fft_padding": False,        # 补零到FFT快速尺寸，输出时裁回原尺寸（会改变仿真结果）
+    "preserve_aspect_ratio": True,  # 按目标图像宽高比确定网格，图像尺寸为长边
+    "profile": True,             # 记录各阶段耗时，显示在性能分析页
+    "target_pe": 0.0,            # 最优适应度达到该值即停止
+    "patience": None,            # 连续多少代无改进即停止，None为不启用
+    "time_budget": None,         # 运行时间预算（秒），None为不限制
+    "max_evaluations": None,     # 仿真评估次数上限，None为不限制
+}
+
+# 仿真任务队列
+QUEUE_OPTIONS = {
+    # 同时运行的任务数；CPU核心按该数平分为各任务的FFT线程数，默认每个任务约4个核心
+    "max_concurrent_jobs": max(1, (os.cpu_count() or 1) // 4),
+    "max_waiting_jobs": 32,      # 最多排队等待的任务数
+}
+
+# 仿真结果库：相同任务直接取回历史结果，超出容量时淘汰最久未访问的记录
+RESULT_STORE_OPTIONS = {
+    "directory": os.environ.get(
+        "LITHO_RESULT_STORE",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "result_store")),
+    "max_bytes": 512 * 1024 * 1024,
+}
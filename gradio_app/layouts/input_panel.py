@@ -1,5 +1,7 @@
 import gradio as gr
 
+from core.optimizers import OPTIMIZER_ENGINES
+
 
 def create_input_panel(default_parameters):
     with gr.Tab("⚙️ 仿真参数配置", elem_classes=["parameter-tab"]):
@@ -83,6 +85,12 @@ def create_input_panel(default_parameters):
 
         # 优化参数
         with gr.Accordion("🧬 遗传算法参数", open=False, elem_classes=["accordion"]):
+            optimizer_engine = gr.Dropdown(
+                choices=[(label, name) for name, label in OPTIMIZER_ENGINES.items()],
+                value=default_parameters["optimizer_engine"],
+                label="优化引擎",
+                elem_classes=["parameter-input"]
+            )
             with gr.Row():
                 with gr.Column():
                     population_size = gr.Number(
@@ -122,6 +130,11 @@ def create_input_panel(default_parameters):
                 size="lg",
                 elem_classes=["analyze-btn", "primary-button"]
             )
+            stop_button = gr.Button(
+                "⏹ 停止优化",
+                variant="secondary",
+                size="lg"
+            )
 
     # 输入面板样式
     gr.HTML("""
@@ -193,5 +206,7 @@ def create_input_panel(default_parameters):
         "generations": generations,
         "crossover_rate": crossover_rate,
         "mutation_rate": mutation_rate,
-        "simulate_button": simulate_button
+        "optimizer_engine": optimizer_engine,
+        "simulate_button": simulate_button,
+        "stop_button": stop_button
     }
\ No newline at end of file
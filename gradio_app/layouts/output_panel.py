@@ -84,6 +84,33 @@ def create_output_panel(state_manager):
                         label="优化过程收敛曲线"
                     )
 
+            with gr.Row():
+                performance_table = gr.DataFrame(
+                    headers=["阶段", "调用次数", "总耗时(ms)", "占运行时间", "p50(ms)", "p95(ms)"],
+                    label="耗时分析",
+                    interactive=False
+                )
+            with gr.Row():
+                trace_button = gr.Button("导出Chrome Trace", scale=1)
+                trace_file = gr.File(label="Trace文件", interactive=False, scale=4)
+
+        with gr.Tab("🗂️ 历史记录"):
+            with gr.Row():
+                history_table = gr.DataFrame(
+                    headers=["时间", "优化引擎", "图像尺寸", "初始PE", "优化PE", "停止原因", "结果键"],
+                    label="历史仿真结果",
+                    interactive=False
+                )
+            with gr.Row():
+                history_select = gr.Dropdown(
+                    label="选择历史记录",
+                    choices=[],
+                    interactive=True,
+                    scale=4
+                )
+                history_refresh = gr.Button("刷新", scale=1)
+                history_load = gr.Button("载入到仿真结果", variant="primary", scale=1)
+
         with gr.Tab("ℹ️ 系统信息"):
             gr.Markdown("""
             ### 数字光刻成像模拟系统
@@ -148,5 +175,12 @@ def create_output_panel(state_manager):
         "optimized_binary": optimized_binary,
         "stats_display": stats_display,
         "evolution_plot": evolution_plot,
-        "system_status": system_status
+        "performance_table": performance_table,
+        "trace_button": trace_button,
+        "trace_file": trace_file,
+        "system_status": system_status,
+        "history_table": history_table,
+        "history_select": history_select,
+        "history_refresh": history_refresh,
+        "history_load": history_load
     }
\ No newline at end of file
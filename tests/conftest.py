@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# 测试直接从仓库根目录导入core、utils等包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gradio_app.config.lithography_config import DEFAULT_PARAMETERS, SIMULATION_OPTIONS
+
+
+@pytest.fixture
+def parameters():
+    """默认仿真参数；固定FFT后端与线程数，避免测速与多线程带来的差异"""
+    return {**DEFAULT_PARAMETERS, **SIMULATION_OPTIONS, "fft_backend": "scipy", "fft_workers": 1,
+            "profile": False}
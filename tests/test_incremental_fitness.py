@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from core.genetic_algorithm import MaskOptimizer
+from core.lithography_simulation import LithographySimulator, OpticalKernelCache
+
+SIZE = 23
+
+
+def changed_mask(mask, rng, count=5):
+    """随机翻转count个像素，返回(新掩膜, 行, 列, 变化量)"""
+    flat = rng.choice(mask.size, count, replace=False)
+    rows, cols = np.unravel_index(flat, mask.shape)
+    new_mask = mask.copy()
+    new_mask[rows, cols] = 1 - new_mask[rows, cols]
+    return new_mask, rows, cols, new_mask[rows, cols] - mask[rows, cols]
+
+
+@pytest.mark.parametrize("real_fft", [True, False])
+@pytest.mark.parametrize("precision", ["float64", "float32"])
+@pytest.mark.parametrize("fft_padding", [False, True])
+def test_update_spectrum_matches_forward_spectrum(parameters, real_fft, precision, fft_padding):
+    parameters = dict(parameters, image_size=SIZE, real_fft=real_fft, precision=precision,
+                      fft_padding=fft_padding)
+    simulator = LithographySimulator(parameters, OpticalKernelCache())
+    rng = np.random.default_rng(0)
+    mask = (rng.random((SIZE, SIZE)) > 0.5).astype(np.float64)
+    new_mask, rows, cols, deltas = changed_mask(mask, rng)
+
+    updated = simulator.update_spectrum(simulator.forward_spectrum(mask), rows, cols, deltas)
+    expected = simulator.forward_spectrum(new_mask)
+    assert updated.shape == expected.shape
+    tolerance = 1e-9 if precision == "float64" else 1e-3
+    np.testing.assert_allclose(updated, expected, rtol=0, atol=tolerance * SIZE)
+
+
+def test_incremental_fitness_matches_full_evaluation(parameters):
+    parameters = dict(parameters, image_size=SIZE, workers=0, incremental_change_ratio=0.05)
+    target = np.zeros((SIZE, SIZE))
+    target[5:18, 8:15] = 1
+    simulator = LithographySimulator(parameters, OpticalKernelCache())
+    full = MaskOptimizer(simulator, target)
+    incremental = MaskOptimizer(LithographySimulator(dict(parameters, incremental_fitness=True),
+                                                     OpticalKernelCache()), target)
+
+    rng = np.random.default_rng(1)
+    parent = incremental.make_individual(target.astype(np.float32).ravel().copy())
+    incremental.evaluate_individual(parent)
+    for _ in range(3):
+        # 子代沿用父代的spectrum_key，与DEAP克隆后的个体一致
+        child_mask, _, _, _ = changed_mask(np.asarray(parent).reshape(SIZE, SIZE), rng)
+        child = incremental.make_individual(child_mask.ravel().copy())
+        child.spectrum_key = parent.spectrum_key
+        assert incremental.evaluate_individual(child) == full.evaluate_individual(
+            full.make_individual(child_mask.ravel().copy()))
+        parent = child
+    assert incremental.incremental_updates == 3
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from core.inverse_lithography import GradientMaskOptimizer
+from core.lithography_simulation import LithographySimulator, OpticalKernelCache
+
+SIZE = 24
+
+
+def central_difference(optimizer, theta, index, step=1e-5):
+    offset = np.zeros_like(theta)
+    offset[index] = step
+    return (optimizer.loss_and_gradient(theta + offset)[0]
+            - optimizer.loss_and_gradient(theta - offset)[0]) / (2 * step)
+
+
+@pytest.mark.parametrize("imaging_mode", ["scalar", "socs"])
+def test_gradient_matches_central_differences(parameters, imaging_mode):
+    # 较小的光刻胶陡度使损失足够光滑，中心差分的截断误差可以忽略
+    parameters = dict(parameters, image_size=SIZE, imaging_mode=imaging_mode, resist_steepness=8.0)
+    simulator = LithographySimulator(parameters, OpticalKernelCache())
+    target = np.zeros((SIZE, SIZE))
+    target[6:18, 8:14] = 1
+    optimizer = GradientMaskOptimizer(simulator, target)
+
+    rng = np.random.default_rng(0)
+    theta = rng.normal(0, 0.5, (SIZE, SIZE))
+    _, gradient, _ = optimizer.loss_and_gradient(theta)
+
+    # 随机像素之外包含空间像最大值处的像素，归一化常数的梯度项集中在该处
+    aerial = simulator.simulate(optimizer.mask_from_theta(theta))
+    indices = [np.unravel_index(np.argmax(aerial), aerial.shape)]
+    indices += [tuple(index) for index in rng.integers(0, SIZE, (20, 2))]
+    for index in indices:
+        expected = central_difference(optimizer, theta, index)
+        assert gradient[index] == pytest.approx(expected, rel=1e-4, abs=1e-9)
+
+
+def test_lbfgs_loss_never_increases(parameters):
+    # 学习率过大且只允许一次回溯时线搜索经常失败，失败的步不能被接受
+    parameters = dict(parameters, image_size=SIZE, ilt_iterations=6, ilt_learning_rate=50.0)
+    simulator = LithographySimulator(parameters, OpticalKernelCache())
+    target = np.zeros((SIZE, SIZE))
+    target[6:18, 8:14] = 1
+    optimizer = GradientMaskOptimizer(simulator, target, method="lbfgs")
+
+    theta = optimizer.theta_from_mask(target * 0.9 + 0.05)
+    losses = [loss for _, loss, _ in optimizer._lbfgs_steps(theta, max_backtracks=1)]
+    assert np.all(np.diff(losses) <= 0)
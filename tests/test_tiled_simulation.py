@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from scipy.signal import fftconvolve
+
+from core.lithography_simulation import LithographySimulator
+from core.tiled_simulation import simulate_layout
+
+
+def random_layout(shape, rng, count=40):
+    layout = np.zeros(shape, np.uint8)
+    for _ in range(count):
+        row, col = rng.integers(0, shape[0] - 8), rng.integers(0, shape[1] - 8)
+        layout[row:row + rng.integers(2, 8), col:col + rng.integers(2, 8)] = 255
+    return layout
+
+
+def full_field_reference(layout, parameters, tile_size):
+    """以分块网格上的点扩散函数对补零后的整幅版图做线性卷积，按全局最大强度归一化"""
+    entry = LithographySimulator(dict(parameters, image_size=tile_size)).get_kernel()
+    kernels = np.broadcast_to(entry.kernels, entry.kernels.shape[:1] + (tile_size, tile_size))
+    psf = np.fft.fftshift(np.fft.ifft2(kernels), axes=(-2, -1))
+    mask = layout / 255.0
+    if entry.weights is None:
+        reference = np.abs(fftconvolve(mask, psf[0], mode="full"))
+    else:
+        reference = sum(weight * np.abs(fftconvolve(mask, kernel, mode="full")) ** 2
+                        for weight, kernel in zip(entry.weights, psf))
+    center = tile_size // 2
+    reference = reference[center:center + layout.shape[0], center:center + layout.shape[1]]
+    return reference / reference.max()
+
+
+# SOCS核的支撑半径远大于标量核，需要更大的分块才能留出有效区域
+@pytest.mark.parametrize("imaging_mode, tile_size, shape", [("scalar", 64, (150, 110)),
+                                                            ("socs", 512, (500, 460))])
+def test_stitched_tiles_match_full_field(parameters, tmp_path, imaging_mode, tile_size, shape):
+    parameters = dict(parameters, imaging_mode=imaging_mode, distance=1e7)
+    # 行列都不是有效分块尺寸的整数倍，覆盖边界处不完整的分块
+    layout = random_layout(shape, np.random.default_rng(0), count=shape[0] * shape[1] // 400)
+    np.save(tmp_path / "layout.npy", layout)
+
+    halo, _ = simulate_layout(str(tmp_path / "layout.npy"), str(tmp_path / "aerial.npy"), parameters,
+                              tile_size=tile_size, workers=1)
+    aerial = np.load(tmp_path / "aerial.npy")
+    assert 0 < halo < tile_size // 2
+    assert aerial.shape == layout.shape
+    np.testing.assert_allclose(aerial, full_field_reference(layout, parameters, tile_size), rtol=0, atol=1e-2)
@@ -3,15 +3,45 @@ from PIL import Image
 import cv2
 
 
+def _pil_size(target_size):
+    """target_size为整数（正方形）或(行数, 列数)，返回PIL使用的(宽, 高)"""
+    if np.isscalar(target_size):
+        return int(target_size), int(target_size)
+    rows, cols = target_size
+    return int(cols), int(rows)
+
+
+def fit_grid_shape(image_path, long_side):
+    """保持图像宽高比的网格形状(行数, 列数)，长边为long_side"""
+    if isinstance(image_path, str):
+        with Image.open(image_path) as image:
+            width, height = image.size
+    else:
+        height, width = np.shape(image_path)[:2]
+    scale = long_side / max(width, height)
+    return max(1, round(height * scale)), max(1, round(width * scale))
+
+
+def resample_image(image_array, target_size):
+    """将[0, 1]浮点图像用LANCZOS插值重采样为target_size（边长或(行数, 列数)），用于多分辨率优化"""
+    image = Image.fromarray(np.asarray(image_array, dtype=np.float32))
+    image = image.resize(_pil_size(target_size), Image.Resampling.LANCZOS)
+    return np.clip(np.array(image, dtype=np.float32), 0, 1)
+
+
 def load_and_preprocess_image(image_path, target_size=30):
-    """加载并预处理图像为仿真可用格式"""
+    """加载并预处理图像为仿真可用格式，target_size为边长或(行数, 列数)"""
+    if isinstance(image_path, np.ndarray) and np.issubdtype(image_path.dtype, np.floating):
+        # 已归一化的浮点数组（如仿真中间结果）直接重采样
+        return resample_image(image_path, target_size)
+
     if isinstance(image_path, str):
         image = Image.open(image_path).convert('L')  # 转为灰度
     else:
         image = Image.fromarray(image_path).convert('L')
 
-    # 调整尺寸 - 确保是正方形
-    image = image.resize((target_size, target_size), Image.Resampling.LANCZOS)
+    # 调整尺寸
+    image = image.resize(_pil_size(target_size), Image.Resampling.LANCZOS)
 
     # 转为numpy数组并归一化
     image_array = np.array(image).astype(np.float32) / 255.0
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+try:
+    import tifffile
+except ImportError:  # tifffile为可选依赖，仅读取TIFF版图时需要
+    tifffile = None
+
+RAW_EXTENSIONS = (".raw", ".bin")
+TIFF_EXTENSIONS = (".tif", ".tiff")
+
+
+def open_layout(path, shape=None, dtype=None):
+    """以内存映射方式只读打开大尺寸版图，不把整幅图像读入内存
+
+    支持.npy、无文件头的.raw/.bin（需给出shape与dtype）以及未压缩的TIFF。
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        layout = np.load(path, mmap_mode="r")
+    elif extension in RAW_EXTENSIONS:
+        if shape is None or dtype is None:
+            raise ValueError("读取raw版图需要指定shape与dtype")
+        layout = np.memmap(path, dtype=dtype, mode="r", shape=tuple(shape))
+    elif extension in TIFF_EXTENSIONS:
+        if tifffile is None:
+            raise ImportError("未安装tifffile，无法读取TIFF版图（pip install tifffile）")
+        try:
+            layout = tifffile.memmap(path, mode="r")
+        except ValueError:
+            # 压缩或分条存储的TIFF无法直接映射，只能整体解码
+            print(f"警告: {path} 无法内存映射，将整体读入内存")
+            layout = tifffile.imread(path)
+    else:
+        raise ValueError(f"不支持的版图格式: {extension}")
+
+    if layout.ndim != 2:
+        raise ValueError(f"版图应为二维灰度图像，实际形状为 {layout.shape}")
+    return layout
+
+
+def create_layout(path, shape, dtype=np.float32):
+    """创建可写的.npy内存映射文件，用于逐块写入仿真结果"""
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=tuple(shape))
+
+
+def to_unit_range(block):
+    """将版图数据块转换为[0, 1]范围的浮点透过率"""
+    if block.dtype == np.bool_:
+        return block.astype(np.float32)
+    if np.issubdtype(block.dtype, np.integer):
+        return block.astype(np.float32) / np.iinfo(block.dtype).max
+    return np.clip(block, 0, 1).astype(np.float32)
@@ -7,6 +7,9 @@ def validate_parameters(parameters):
 
     # 确保所有参数都是有效的数值
     for key, value in parameters.items():
+        # 字符串等非数值选项（如FFT后端名称）不做数值检查
+        if not isinstance(value, (int, float, np.number)):
+            continue
         if not np.isfinite(value):
             print(f"警告: 参数 {key} 的值 {value} 无效，使用默认值")
             # 设置合理的默认值
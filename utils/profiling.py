@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+_NULL_SPAN = nullcontext()
+
+
+class Profiler:
+    """轻量的耗时区间记录器：按名称记录每次调用的起止时间，可汇总并导出Chrome Trace"""
+
+    enabled = True
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        # 每条记录为(名称, 相对起点的开始时间, 持续时间, 线程号)，均以秒计
+        self.spans = []
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.spans.append((name, start - self.origin, end - start, threading.get_ident()))
+
+    def summary(self):
+        """按名称汇总：返回[(名称, 次数, 总耗时, 平均, p50, p95)]，按总耗时降序，时间单位为秒"""
+        durations = {}
+        for name, _, duration, _ in list(self.spans):
+            durations.setdefault(name, []).append(duration)
+
+        rows = []
+        for name, values in durations.items():
+            values = np.asarray(values)
+            rows.append((name, len(values), float(values.sum()), float(values.mean()),
+                         float(np.percentile(values, 50)), float(np.percentile(values, 95))))
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def to_chrome_trace(self):
+        """Chrome Trace事件格式（可在chrome://tracing或Perfetto中打开）"""
+        pid = os.getpid()
+        events = [{"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid, "tid": tid,
+                   "ts": start * 1e6, "dur": duration * 1e6}
+                  for name, start, duration, tid in list(self.spans)]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+        return path
+
+
+class NullProfiler:
+    """不记录任何数据的占位记录器，未启用性能分析时使用"""
+
+    enabled = False
+    spans = ()
+
+    def span(self, name):
+        return _NULL_SPAN
+
+    def summary(self):
+        return []
+
+    def to_chrome_trace(self):
+        return {"traceEvents": [], "displayTimeUnit": "ms"}
+
+
+null_profiler = NullProfiler()
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from deap import tools
+
+from utils.parameter_validation import validate_parameters
+
+# 不影响仿真结果的参数，不参与结果键的计算
+NON_RESULT_KEYS = ("fft_backend", "fft_workers", "workers", "profile")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 结果字典中按数组保存的字段：(npz中的名称, 结果字典中的路径)
+RESULT_ARRAYS = (
+    ("target", ("target",)),
+    ("initial_mask", ("initial", "mask")),
+    ("initial_simulation", ("initial", "simulation")),
+    ("initial_binary", ("initial", "binary")),
+    ("optimized_mask", ("optimized", "mask")),
+    ("optimized_simulation", ("optimized", "simulation")),
+    ("optimized_binary", ("optimized", "binary")),
+)
+
+
+def _json_value(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class ResultStore:
+    """持久化的仿真结果库：结果以.npz保存在目录中，SQLite索引记录元数据与访问时间
+
+    结果以(掩膜, 目标图像, 校验后的参数)的内容哈希为键，相同任务可直接取回；
+    总大小超过max_bytes时按最近最少使用淘汰。
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.sqlite")
+        # 多个会话可能同时写入，写入与淘汰串行执行
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS runs (
+                key TEXT PRIMARY KEY, created REAL, accessed REAL, size INTEGER,
+                initial_pe REAL, optimized_pe REAL, stop_reason TEXT,
+                parameters TEXT, log TEXT)""")
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.npz")
+
+    @staticmethod
+    def make_key(mask, target, parameters):
+        """由预处理后的掩膜、目标图像与校验后的参数计算结果键"""
+        parameters = validate_parameters(parameters)
+        relevant = {name: value for name, value in parameters.items() if name not in NON_RESULT_KEYS}
+        digest = hashlib.sha256()
+        for array in (mask, target):
+            array = np.ascontiguousarray(array, dtype=np.float32)
+            digest.update(str(array.shape).encode())
+            digest.update(array.tobytes())
+        digest.update(json.dumps(relevant, sort_keys=True, default=_json_value).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """返回与界面格式一致的结果字典，不存在时返回None"""
+        with self._connect() as db:
+            row = db.execute("SELECT initial_pe, optimized_pe, parameters, log FROM runs WHERE key = ?",
+                             (key,)).fetchone()
+            if row is None:
+                return None
+            try:
+                with np.load(self._path(key)) as data:
+                    arrays = {name: data[name] for name, _ in RESULT_ARRAYS}
+            except (OSError, ValueError, KeyError):
+                # 数据文件丢失或损坏时删除索引项
+                db.execute("DELETE FROM runs WHERE key = ?", (key,))
+                return None
+            db.execute("UPDATE runs SET accessed = ? WHERE key = ?", (time.time(), key))
+
+        initial_pe, optimized_pe, parameters_json, log_json = row
+        results = {"initial": {"pe": initial_pe}, "optimized": {"pe": optimized_pe},
+                   "parameters": json.loads(parameters_json), "log": self._load_log(log_json)}
+        for name, path in RESULT_ARRAYS:
+            if len(path) == 1:
+                results[path[0]] = arrays[name]
+            else:
+                results[path[0]][path[1]] = arrays[name]
+        results["original"] = results["target"]
+        return results
+
+    def put(self, key, results, parameters):
+        """保存结果并在超出容量时淘汰最久未访问的记录"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {}
+        for name, keys in RESULT_ARRAYS:
+            value = results
+            for part in keys:
+                value = value[part]
+            arrays[name] = np.asarray(value)
+
+        with self._lock:
+            # 先写临时文件再改名，避免读到写了一半的结果
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(temporary, path)
+
+            log = results.get("log")
+            now = time.time()
+            with self._connect() as db:
+                db.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+                    key, now, now, os.path.getsize(path),
+                    float(results["initial"]["pe"]), float(results["optimized"]["pe"]),
+                    getattr(log, "stop_reason", None),
+                    json.dumps(parameters, sort_keys=True, default=_json_value),
+                    self._dump_log(log)))
+            self._evict()
+
+    def _evict(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT key, size FROM runs ORDER BY accessed DESC").fetchall()
+            total = 0
+            for key, size in rows:
+                total += size
+                if total > self.max_bytes:
+                    db.execute("DELETE FROM runs WHERE key = ?", (key,))
+                    try:
+                        os.remove(self._path(key))
+                    except OSError:
+                        pass
+
+    def list_runs(self, limit=100):
+        """最近访问的记录，返回(键, 创建时间, PE初始值, PE优化值, 停止原因, 参数字典)列表"""
+        with self._connect() as db:
+            rows = db.execute("""SELECT key, created, initial_pe, optimized_pe, stop_reason, parameters
+                                 FROM runs ORDER BY accessed DESC LIMIT ?""", (limit,)).fetchall()
+        return [(key, created, initial_pe, optimized_pe, stop_reason, json.loads(parameters))
+                for key, created, initial_pe, optimized_pe, stop_reason, parameters in rows]
+
+    def total_bytes(self):
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(SUM(size), 0) FROM runs").fetchone()[0]
+
+    @staticmethod
+    def _dump_log(log):
+        if log is None:
+            return None
+        return json.dumps({"header": getattr(log, "header", None), "records": list(log),
+                           "stop_reason": getattr(log, "stop_reason", None)}, default=_json_value)
+
+    @staticmethod
+    def _load_log(log_json):
+        """还原为DEAP Logbook，保持与优化器输出相同的接口"""
+        log = tools.Logbook()
+        if log_json is None:
+            return log
+        data = json.loads(log_json)
+        if data["header"]:
+            log.header = data["header"]
+        for record in data["records"]:
+            log.record(**record)
+        log.stop_reason = data["stop_reason"]
+        return log